@@ -0,0 +1,204 @@
+import itertools as it
+import random
+import typing
+from game import Board, Domino, Dominoes, Game, Play, Player, Rule, TermColor
+from planner import Planner
+from search import Expectimax, Position
+
+
+class Agent:
+    """Computer player. Game asks it which line index to pick and where to
+    place the picked domino instead of reading from the terminal."""
+
+    def select(self, game: Game, player: Player) -> int:
+        raise NotImplementedError
+
+    def place(
+        self,
+        game: Game,
+        player: Player,
+        domino: Domino,
+    ) -> typing.Optional[Play]:
+        """Returns None to discard the domino."""
+        raise NotImplementedError
+
+    @staticmethod
+    def free(game: Game) -> typing.List[typing.Tuple[int, Domino]]:
+        return [
+            (i, domino)
+            for i, (player, domino) in enumerate(game.line.line)
+            if player is None
+        ]
+
+    @staticmethod
+    def forced(
+        board: Board,
+        domino: Domino,
+    ) -> typing.Tuple[bool, typing.Optional[Play]]:
+        """Returns (True, play) when there is at most one valid play, which
+        is None if the domino must be discarded."""
+        plays = list(it.islice(board.iter_valid_plays(domino), 2))
+        if len(plays) < 2:
+            return True, plays[0] if plays else None
+        return False, None
+
+    @staticmethod
+    def book_play(
+        game: Game,
+        board: Board,
+        domino: Domino,
+    ) -> typing.Optional[Play]:
+        if game.book is None:
+            return None
+        return game.book.play(board, domino)
+
+
+class GreedyAgent(Agent):
+    """Takes whatever scores the most points right now, or whatever
+    evaluate likes best."""
+
+    def __init__(self, evaluate: typing.Callable[[Board], float] = None):
+        self.evaluate = evaluate
+
+    def best(
+        self,
+        board: Board,
+        domino: Domino,
+    ) -> typing.Tuple[float, typing.Optional[Play]]:
+        if self.evaluate is None:
+            ranked = board.ranked_plays(domino)
+            if not ranked:
+                return board.points(), None
+            delta, play = ranked[0]
+            return board.points() + delta.points, play
+
+        best: typing.Tuple[float, typing.Optional[Play]] = (
+            self.evaluate(board), None
+        )
+        for play in board.valid_plays(domino):
+            child = board.copy()
+            child.play(play)
+            score = self.evaluate(child)
+            if best[1] is None or score > best[0]:
+                best = (score, play)
+        return best
+
+    def select(self, game: Game, player: Player) -> int:
+        board = game.boards[player]
+        return max(
+            self.free(game),
+            key=lambda entry: self.best(board, entry[1])[0],
+        )[0]
+
+    def place(
+        self,
+        game: Game,
+        player: Player,
+        domino: Domino,
+    ) -> typing.Optional[Play]:
+        board = game.boards[player]
+        play = self.book_play(game, board, domino)
+        if play is not None:
+            return play
+        forced, play = self.forced(board, domino)
+        if forced:
+            return play
+        return self.best(board, domino)[1]
+
+
+class PlannerAgent(Agent):
+    """Picks and places with a Planner over the dominoes it knows it will
+    place this turn."""
+
+    def __init__(self, planner: Planner):
+        self.planner = planner
+
+    def select(self, game: Game, player: Player) -> int:
+        board = game.boards[player]
+        if game.book is not None:
+            ranked = [
+                (game.book.score(board, domino), i)
+                for i, domino in self.free(game)
+            ]
+            if all(score is not None for score, _ in ranked):
+                return max(ranked)[1]
+        return max(
+            self.free(game),
+            key=lambda entry: self.planner.solve([entry[1]], board).score,
+        )[0]
+
+    def place(
+        self,
+        game: Game,
+        player: Player,
+        domino: Domino,
+    ) -> typing.Optional[Play]:
+        board = game.boards[player]
+        play = self.book_play(game, board, domino)
+        if play is not None:
+            return play
+        forced, play = self.forced(board, domino)
+        if forced:
+            return play
+        return self.planner.solve([domino], board).plays[0]
+
+
+class SearchAgent(Agent):
+    """Picks and places by an Expectimax search (or Paranoid or MaxN) over
+    every board, seeing only what players can see: the next lines are
+    chance nodes over the dominoes not yet seen, not the Deck order."""
+
+    def __init__(self, search: Expectimax, dominoes: Dominoes):
+        self.search = search
+        self.dominoes = dominoes
+        self.plays: typing.Dict[typing.Tuple[Player, int], typing.Optional[Play]] = {}
+
+    def select(self, game: Game, player: Player) -> int:
+        position = Position.from_game(game, self.dominoes, player, self.plays)
+        move = self.search.search(position, game.players.index(player)).move
+        domino = position.line[move.slot]
+        self.plays[(player, domino.number)] = move.play
+        return move.slot
+
+    def place(
+        self,
+        game: Game,
+        player: Player,
+        domino: Domino,
+    ) -> typing.Optional[Play]:
+        board = game.boards[player]
+        play = self.book_play(game, board, domino)
+        if play is not None:
+            return play
+        forced, play = self.forced(board, domino)
+        if forced:
+            return play
+        # Planned before this turn's other placements, which may block it.
+        play = self.plays.pop((player, domino.number), None)
+        if play is not None and board.valid_play(play):
+            return play
+        return board.ranked_plays(domino)[0][1]
+
+
+if __name__ == "__main__":
+
+    filename = "kingdomino.json"
+    dominoes = Dominoes.from_json(filename)
+
+    random.seed(0)
+
+    players = [
+        Player(name="Greedy", color=TermColor.BLUE),
+        Player(name="Planner", color=TermColor.RED),
+        Player(name="Search", color=TermColor.GREEN),
+    ]
+    game = Game(
+        dominoes=dominoes,
+        players=players,
+        agents={
+            players[0]: GreedyAgent(),
+            players[1]: PlannerAgent(Planner(Rule.THREE_PLAYERS)),
+            players[2]: SearchAgent(Expectimax(depth=2, samples=4), dominoes),
+        },
+    )
+    game.start()
@@ -0,0 +1,239 @@
+import argparse
+import collections
+import concurrent.futures
+import functools
+import json
+import random
+import sys
+import time
+import typing
+from game import Board, CATALOGUE, Catalogue, Direction, Domino, Dominoes, Play, Point, Rule
+from planner import Planner, Timeout
+
+
+Position = typing.Dict[str, typing.Any]
+
+# Set once per worker process by _init_worker.
+_evaluate: typing.Optional[typing.Callable[[Board], float]] = None
+
+
+def rules_from_list(names: typing.List[str]) -> Rule:
+    return functools.reduce(lambda rules, name: rules | Rule[name], names, Rule(0))
+
+
+def board_from_dict(
+    rules: Rule,
+    board: typing.Dict[str, list],
+    catalogue: Catalogue,
+) -> Board:
+    """Replays {"plays": [[number, x, y, direction], ...], "discards":
+    [number, ...]} onto a new board."""
+    new = Board(rules=rules)
+    for number, x, y, direction in board.get("plays", []):
+        new.play(
+            Play(
+                domino=catalogue[number],
+                point=Point(x, y),
+                direction=Direction.from_string(direction),
+            )
+        )
+    for number in board.get("discards", []):
+        new.discard(catalogue[number])
+    return new
+
+
+def board_to_dict(board: Board) -> typing.Dict[str, list]:
+    return {
+        "plays": [
+            [play.domino.number, *play.point, play.direction.name.lower()]
+            for play in board.played
+        ],
+        "discards": [domino.number for domino in board.discards],
+    }
+
+
+def play_to_list(play: typing.Optional[Play]) -> typing.Optional[list]:
+    if play is None:
+        return None
+    return [*play.point, play.direction.name.lower()]
+
+
+def expected_best(
+    planner: Planner,
+    board: Board,
+    domino: Domino,
+    futures: typing.Counter[typing.Tuple[Domino, ...]],
+    deadline: typing.Optional[float] = None,
+) -> typing.Tuple[float, typing.Optional[Play]]:
+    """The placement of domino with the best score averaged over futures,
+    weighted by their counts, each searched exactly."""
+    planner.deadline = deadline
+    total = sum(futures.values())
+    best: typing.Tuple[float, typing.Optional[Play]] = (float("-inf"), None)
+    for play, child in planner.children(board, domino):
+        score = sum(
+            count * planner.solve(list(future), child, deadline).score
+            for future, count in futures.items()
+        ) / total
+        if score > best[0]:
+            best = (score, play)
+    return best
+
+
+def analyse(
+    position: Position,
+    catalogue: Catalogue,
+    budget: float,
+    evaluate: typing.Callable[[Board], float] = None,
+    samples: int = 8,
+) -> typing.Dict[str, typing.Any]:
+    """Scores every board and ranks each domino in the line for the first
+    board, the player to move.
+
+    The order of the deck is unknown, so the board's next dominoes are
+    sampled from it, at most its share of the deck. Each domino is placed
+    where it scores best on average over those samples, looking one more of
+    them ahead on each pass while the time budget lasts. The ranking is
+    from the deepest pass that finished for every domino in the line."""
+    start = time.perf_counter()
+    deadline = start + budget
+    if not isinstance(position, dict):
+        raise ValueError("position is not an object")
+    if not position.get("boards") or not isinstance(position["boards"], list):
+        raise ValueError("position has no boards")
+    if not all(isinstance(board, dict) for board in position["boards"]):
+        raise ValueError("every board must be an object")
+    rules = rules_from_list(position["rules"])
+    boards = [
+        board_from_dict(rules, board, catalogue)
+        for board in position["boards"]
+    ]
+    line = [catalogue[number] for number in position.get("line", [])]
+    deck = [catalogue[number] for number in position.get("deck", [])]
+
+    # After the last line the game is over and only real points count.
+    if not deck or evaluate is None:
+        evaluate = Board.points
+
+    rng = random.Random(0)
+    sequences = [rng.sample(deck, len(deck)) for _ in range(samples)]
+    planner = Planner(rules, evaluate=evaluate)
+
+    best: typing.Dict[int, typing.Tuple[float, typing.Optional[Play]]] = {}
+    lookahead = -1
+    complete = False
+    for ahead in range(len(deck) // len(boards) + 1):
+        futures = collections.Counter(tuple(sequence[:ahead]) for sequence in sequences)
+        try:
+            ranking = {
+                domino.number: expected_best(planner, boards[0], domino, futures, deadline)
+                for domino in line
+            }
+        except Timeout:
+            break
+        best, lookahead = ranking, ahead
+    else:
+        complete = True
+
+    return {
+        "boards": [
+            {
+                "points": board.points(),
+                "crowns": board.crowns(),
+                "dead": board.dead_cells(),
+                "fillable": board.fillable_cells(),
+            }
+            for board in boards
+        ],
+        "best": sorted(
+            (
+                {
+                    "domino": number,
+                    "play": play_to_list(play),
+                    "score": score,
+                }
+                for number, (score, play) in best.items()
+            ),
+            key=lambda entry: entry["score"],
+            reverse=True,
+        ),
+        "lookahead": lookahead,
+        "complete": complete,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _init_worker(filename: str, evaluator_filename: typing.Optional[str]) -> None:
+    global _evaluate
+    Dominoes.from_json(filename)
+    if evaluator_filename is not None:
+        from evaluator import LinearEvaluator
+        _evaluate = LinearEvaluator.from_json(evaluator_filename)
+
+
+def _work(line: str, budget: float) -> typing.Dict[str, typing.Any]:
+    # Any failure is one bad position, never a reason to stop the stream.
+    try:
+        return analyse(json.loads(line), CATALOGUE, budget, _evaluate)
+    except Exception as e:
+        return {"error": f"{e.__class__.__name__}: {e}"}
+
+
+def analyse_stream(
+    lines: typing.Iterable[str],
+    filename: str,
+    budget: float,
+    workers: typing.Optional[int] = None,
+    in_flight: int = 64,
+    evaluator_filename: typing.Optional[str] = None,
+) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    """Yields one result per non blank line, in input order, keeping at
+    most in_flight positions queued or running at once. Each result's index
+    is its line number in the input, counting from 0."""
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(filename, evaluator_filename),
+    ) as executor:
+        pending: typing.Deque[typing.Tuple[int, concurrent.futures.Future]] = collections.deque()
+        for index, line in enumerate(lines):
+            if not line.strip():
+                continue
+            if len(pending) >= in_flight:
+                done, future = pending.popleft()
+                yield {"index": done, **future.result()}
+            pending.append((index, executor.submit(_work, line, budget)))
+        while pending:
+            done, future = pending.popleft()
+            yield {"index": done, **future.result()}
+
+
+def main(argv: typing.List[str] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Analyse Kingdomino positions from JSONL, one per line."
+    )
+    parser.add_argument("input", nargs="?", help="JSONL file, stdin by default")
+    parser.add_argument("-o", "--output", help="JSONL file, stdout by default")
+    parser.add_argument("--dominoes", default="kingdomino.json")
+    parser.add_argument("--evaluator", help="LinearEvaluator JSON for unfinished games")
+    parser.add_argument("--workers", type=int, help="processes, all cores by default")
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds per position")
+    parser.add_argument("--in-flight", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    source = open(args.input) if args.input else sys.stdin
+    sink = open(args.output, "w") if args.output else sys.stdout
+    with source, sink:
+        for result in analyse_stream(
+            source,
+            args.dominoes,
+            args.budget,
+            args.workers,
+            args.in_flight,
+            args.evaluator,
+        ):
+            print(json.dumps(result), file=sink, flush=True)
+
+
+if __name__ == "__main__":
+    main()
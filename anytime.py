@@ -0,0 +1,139 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import random
+import time
+import typing
+from game import Board, Domino, Dominoes, Play, Rule
+from planner import Planner, Timeout
+
+
+class Result(typing.NamedTuple):
+    play: typing.Optional[Play]
+    score: float
+    depth: int
+    nodes: int
+    seconds: float
+
+
+def _search(
+    board: Board,
+    dominoes: typing.Sequence[Domino],
+    depth: int,
+    beam_width: typing.Optional[int],
+    evaluate: typing.Optional[typing.Callable[[Board], float]],
+    budget: typing.Optional[float],
+    stop: typing.Any,
+) -> Result:
+    start = time.perf_counter()
+    planner = Planner(
+        board.rules,
+        beam_width=beam_width,
+        evaluate=evaluate,
+        depth=depth,
+    )
+    plan = planner.solve(
+        dominoes,
+        board,
+        deadline=None if budget is None else start + budget,
+        stop=stop.is_set,
+    )
+    return Result(
+        play=plan.plays[0],
+        score=plan.score,
+        depth=depth,
+        nodes=plan.nodes,
+        seconds=plan.seconds,
+    )
+
+
+class Engine:
+    """Runs Planner searches in a process pool and publishes improving
+    results as an async iterator, deepening one domino at a time.
+
+    Many analyses can run at once; max_workers caps the processes, and so
+    the CPUs, they share."""
+
+    def __init__(self, max_workers: typing.Optional[int] = None):
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers)
+        self.manager = multiprocessing.Manager()
+
+    async def analyse(
+        self,
+        board: Board,
+        dominoes: typing.Sequence[Domino],
+        time_limit: typing.Optional[float] = None,
+        beam_width: typing.Optional[int] = None,
+        evaluate: typing.Optional[typing.Callable[[Board], float]] = None,
+    ) -> typing.AsyncIterator[Result]:
+        """Yields a Result per completed depth until every domino is
+        searched, time_limit seconds pass or the caller stops iterating or
+        is cancelled. The running search is stopped in its worker too."""
+        loop = asyncio.get_running_loop()
+        deadline = None if time_limit is None else loop.time() + time_limit
+        stop = self.manager.Event()
+        try:
+            for depth in range(1, len(dominoes) + 1):
+                budget = None if deadline is None else deadline - loop.time()
+                if budget is not None and budget <= 0:
+                    return
+                future = loop.run_in_executor(
+                    self.executor,
+                    _search,
+                    board,
+                    dominoes,
+                    depth,
+                    beam_width,
+                    evaluate,
+                    budget,
+                    stop,
+                )
+                try:
+                    yield await asyncio.wait_for(future, budget)
+                except (Timeout, asyncio.TimeoutError):
+                    return
+        finally:
+            stop.set()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+        self.manager.shutdown()
+
+    async def __aenter__(self) -> "Engine":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.shutdown()
+
+
+if __name__ == "__main__":
+
+    filename = "kingdomino.json"
+    dominoes = Dominoes.from_json(filename)
+
+    random.seed(0)
+
+    async def show(
+        engine: Engine,
+        name: str,
+        sequence: typing.Sequence[Domino],
+        **kwargs,
+    ) -> None:
+        async for result in engine.analyse(Board(Rule.TWO_PLAYERS), sequence, **kwargs):
+            print(f"{name}: {result}")
+        print(f"{name}: done")
+
+    async def main() -> None:
+        async with Engine(max_workers=2) as engine:
+            cancelled = asyncio.create_task(
+                show(engine, "cancelled", random.sample(dominoes, 6))
+            )
+            asyncio.get_running_loop().call_later(1, cancelled.cancel)
+            await asyncio.gather(
+                show(engine, "exact", random.sample(dominoes, 6), time_limit=3),
+                show(engine, "beam", random.sample(dominoes, 6), time_limit=3, beam_width=8),
+                cancelled,
+                return_exceptions=True,
+            )
+
+    asyncio.run(main())
@@ -0,0 +1,167 @@
+import json
+import numpy as np
+import random
+import sys
+import typing
+from game import Board, Domino, Dominoes, Play, Rule
+from probability import SUITS, SUIT_INDEX
+
+
+Policy = typing.Callable[[Board, Domino], typing.Optional[Play]]
+
+FEATURES: typing.Tuple[str, ...] = (
+    "bias",
+    "points",
+    *(f"{suit.to_string()}_{name}" for name in (
+        "tiles",
+        "crowns",
+        "region_tiles",
+        "largest_region",
+        "frontier",
+    ) for suit in SUITS),
+    "fillable",
+    "dead",
+    "window_slack",
+    "middle_kingdom",
+    "harmony",
+)
+
+
+def features(board: Board) -> np.ndarray:
+    """Describes a board for a linear evaluator, in FEATURES order."""
+    suits = len(SUITS)
+    tiles = np.zeros(suits)
+    crowns = np.zeros(suits)
+    region_tiles = np.zeros(suits)
+    largest_region = np.zeros(suits)
+    frontier: typing.List[set] = [set() for _ in SUITS]
+
+    grid = board.grid
+    for point, tile in grid.tiles():
+        if tile.suit not in SUIT_INDEX:
+            continue
+        i = SUIT_INDEX[tile.suit]
+        tiles[i] += 1
+        crowns[i] += tile.crowns
+        frontier[i].update(
+            adjacent for adjacent in point.adjacent_points()
+            if grid.within_grid_and_bounds(adjacent) and grid[adjacent] is None
+        )
+
+    for points in board.union.groups():
+        i = SUIT_INDEX[grid[next(iter(points))].suit]
+        region_tiles[i] += len(points)
+        largest_region[i] = max(largest_region[i], len(points))
+
+    width = grid.max_x - grid.min_x + 1
+    height = grid.max_y - grid.min_y + 1
+    return np.concatenate((
+        (1.0, board.points()),
+        tiles,
+        crowns,
+        region_tiles,
+        largest_region,
+        [len(points) for points in frontier],
+        (
+            board.fillable_cells(),
+            board.dead_cells(),
+            (grid.size - width) + (grid.size - height),
+            float(board.middle_kingdom_achievable()),
+            float(board.harmony_achievable()),
+        ),
+    ))
+
+
+class LinearEvaluator:
+    """Estimates the final points of a board as weights @ features(board)."""
+
+    def __init__(self, weights: np.ndarray):
+        self.weights = weights
+
+    def __call__(self, board: Board) -> float:
+        return float(features(board) @ self.weights)
+
+    def to_json(self, filename: str) -> None:
+        with open(filename, 'w') as f:
+            json.dump(dict(zip(FEATURES, self.weights.tolist())), f, indent=2)
+
+    @classmethod
+    def from_json(cls, filename: str) -> "LinearEvaluator":
+        with open(filename) as f:
+            weights = json.load(f)
+            return cls(np.array([weights[name] for name in FEATURES]))
+
+
+# TRAINING
+
+def random_policy(rng: random.Random) -> Policy:
+    def policy(board: Board, domino: Domino) -> typing.Optional[Play]:
+        plays = list(board.valid_plays(domino))
+        return rng.choice(plays) if plays else None
+    return policy
+
+
+def self_play(
+    rules: Rule,
+    dominoes: Dominoes,
+    games: int,
+    policy: Policy = None,
+    seed: int = 0,
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """Plays solitaire games and labels every intermediate board with the
+    final points of its game."""
+    rng = random.Random(seed)
+    if policy is None:
+        policy = random_policy(rng)
+    num = rules.max_turns() * rules.plays_per_turn()
+    rows = []
+    targets = []
+    for _ in range(games):
+        board = Board(rules=rules)
+        game_rows = [features(board)]
+        for domino in rng.sample(dominoes, num):
+            play = policy(board, domino)
+            if play is None:
+                board.discard(domino)
+            else:
+                board.play(play)
+            game_rows.append(features(board))
+        rows.extend(game_rows)
+        targets.extend([board.points()] * len(game_rows))
+    return np.array(rows), np.array(targets, dtype=float)
+
+
+def fit(
+    x: np.ndarray,
+    y: np.ndarray,
+    ridge: float = 1.0,
+    batch_size: int = 4096,
+) -> LinearEvaluator:
+    """Ridge regression accumulated over batches of rows, so the normal
+    equations never need the whole design matrix at once. The bias is not
+    regularised."""
+    gram = np.zeros((x.shape[1], x.shape[1]))
+    moment = np.zeros(x.shape[1])
+    for start in range(0, len(x), batch_size):
+        batch = x[start:start + batch_size]
+        gram += batch.T @ batch
+        moment += batch.T @ y[start:start + batch_size]
+    penalty = ridge * np.eye(x.shape[1])
+    penalty[0, 0] = 0
+    return LinearEvaluator(np.linalg.solve(gram + penalty, moment))
+
+
+if __name__ == "__main__":
+
+    filename = "kingdomino.json"
+    output = "evaluator.json"
+    dominoes = Dominoes.from_json(filename)
+
+    games = int(sys.argv[1]) if len(sys.argv) == 2 else 200
+
+    x, y = self_play(Rule.TWO_PLAYERS, dominoes, games)
+    split = len(x) * 4 // 5
+    evaluator = fit(x[:split], y[:split])
+    error = x[split:] @ evaluator.weights - y[split:]
+    print(f"{len(x)} boards, held out RMSE {np.sqrt(np.mean(error ** 2)):.2f}")
+    evaluator.to_json(output)
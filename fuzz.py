@@ -0,0 +1,447 @@
+import collections
+import itertools as it
+import random
+import sys
+import time
+import typing
+import unionfind
+from game import BonusPoints, Board, CATALOGUE, Direction, Domino, Dominoes, Grid, GridSize, InvalidPlay, Play, Point, Rule, Suit, Tile
+
+
+Observation = typing.Dict[str, typing.Any]
+PlayKey = typing.Tuple[int, int, str]
+
+
+def play_key(play: Play) -> PlayKey:
+    return (play.point.x, play.point.y, play.direction.name)
+
+
+def play_from_key(domino: Domino, key: PlayKey) -> Play:
+    x, y, direction = key
+    return Play(domino=domino, point=Point(x, y), direction=Direction[direction])
+
+
+class Engine:
+    """Adapter around a board implementation, so the fuzzer can drive
+    different ones with the same moves."""
+
+    name = "engine"
+
+    def new(self, rules: Rule) -> typing.Any:
+        raise NotImplementedError
+
+    def valid_plays(self, state: typing.Any, domino: Domino) -> typing.Set[PlayKey]:
+        raise NotImplementedError
+
+    def has_valid_play(self, state: typing.Any, domino: Domino) -> bool:
+        return bool(self.valid_plays(state, domino))
+
+    def play(self, state: typing.Any, play: Play) -> None:
+        raise NotImplementedError
+
+    def discard(self, state: typing.Any, domino: Domino) -> None:
+        raise NotImplementedError
+
+    def observe(self, state: typing.Any) -> Observation:
+        raise NotImplementedError
+
+
+class Reference(typing.NamedTuple):
+    rules: Rule
+    grid: Grid
+    union: unionfind.UnionFind
+    discards: typing.List[Domino]
+
+
+class ReferenceEngine(Engine):
+    """The original Board algorithms, frozen here so changes to Board
+    cannot change the reference: eager play generation over the vacant
+    points, plain union joins and full scans when scoring."""
+
+    name = "reference"
+
+    def new(self, rules: Rule) -> Reference:
+        return Reference(
+            rules=rules,
+            grid=Grid(GridSize.MIGHTY_DUEL if Rule.MIGHTY_DUEL in rules else GridSize.STANDARD),
+            union=unionfind.UnionFind(),
+            discards=[],
+        )
+
+    def valid_play(self, state: Reference, play: Play) -> bool:
+        grid = state.grid
+        return (
+            all(grid[point] is None for point in play.points)
+            and all(grid.within_grid_and_bounds(point) for point in play.points)
+            and (
+                any(
+                    play.domino.left.valid_connection(grid[point])
+                    for point in play.left_adjacent_points()
+                    if grid.within_grid_and_bounds(point)
+                )
+                or any(
+                    play.domino.right.valid_connection(grid[point])
+                    for point in play.right_adjacent_points()
+                    if grid.within_grid_and_bounds(point)
+                )
+            )
+        )
+
+    def vacant_points(self, state: Reference) -> typing.List[Point]:
+        grid = state.grid
+        vacant_points = []
+        seen: set = set()
+        frontier = collections.deque((grid.middle,))
+        while frontier:
+            point = frontier.popleft()
+            if point in seen:
+                continue
+            seen.add(point)
+            for new_point in point.adjacent_points():
+                if not grid.within_grid_and_bounds(new_point):
+                    continue
+                if grid[new_point] is None:
+                    vacant_points.append(new_point)
+                else:
+                    frontier.append(new_point)
+        return vacant_points
+
+    def valid_plays(self, state: Reference, domino: Domino) -> typing.Set[PlayKey]:
+        valid = set()
+        for point in self.vacant_points(state):
+            for direction in Direction:
+                play = Play(domino=domino, point=point, direction=direction)
+                for candidate in (play, Play.flipped(play)):
+                    if self.valid_play(state, candidate):
+                        valid.add(play_key(candidate))
+        return valid
+
+    def play(self, state: Reference, play: Play) -> None:
+        if not self.valid_play(state, play):
+            raise InvalidPlay
+        left, right = play.points
+        state.grid[left] = play.domino.left
+        state.grid[right] = play.domino.right
+        for a, b in play.adjacent_edges():
+            if state.grid[b] is not None and state.grid[a].suit == state.grid[b].suit:
+                state.union.join(a, b)
+
+    def discard(self, state: Reference, domino: Domino) -> None:
+        state.discards.append(domino)
+
+    def observe(self, state: Reference) -> Observation:
+        crowns_and_tiles = [
+            (sum(state.grid[point].crowns for point in points), len(points))
+            for points in state.union.groups()
+        ]
+        bounded = state.grid.bounded()
+        return {
+            "points": (
+                sum(crowns * tiles for crowns, tiles in crowns_and_tiles)
+                + BonusPoints.MIDDLE_KINGDOM * int(Rule.MIDDLE_KINGDOM in state.rules) * int(bounded)
+                + BonusPoints.HARMONY * int(Rule.HARMONY in state.rules) * int(not state.discards)
+            ),
+            "crowns": sum(crowns for crowns, _ in crowns_and_tiles),
+            "bounded": bounded,
+        }
+
+
+class BoardEngine(Engine):
+    """Board through its public methods as they are today."""
+
+    name = "board"
+
+    def new(self, rules: Rule) -> Board:
+        return Board(rules=rules)
+
+    def valid_plays(self, board: Board, domino: Domino) -> typing.Set[PlayKey]:
+        return {play_key(play) for play in board.valid_plays(domino)}
+
+    def has_valid_play(self, board: Board, domino: Domino) -> bool:
+        return board.has_valid_play(domino)
+
+    def play(self, board: Board, play: Play) -> None:
+        board.play(play)
+
+    def discard(self, board: Board, domino: Domino) -> None:
+        board.discard(domino)
+
+    def observe(self, board: Board) -> Observation:
+        return {
+            "points": board.points(),
+            "crowns": board.crowns(),
+            "bounded": board.grid.is_bounded(),
+        }
+
+
+class Tracked(typing.NamedTuple):
+    board: Board
+    score: typing.List[int]  # [points, crowns]
+
+
+class IncrementalEngine(Engine):
+    """Board through its fast paths: lazy play generation, score previews
+    and incremental bonus tracking."""
+
+    name = "incremental"
+
+    def new(self, rules: Rule) -> Tracked:
+        points = (
+            BonusPoints.HARMONY * int(Rule.HARMONY in rules)
+            + BonusPoints.MIDDLE_KINGDOM * int(Rule.MIDDLE_KINGDOM in rules)
+        )
+        return Tracked(Board(rules=rules), [points, 0])
+
+    def valid_plays(self, state: Tracked, domino: Domino) -> typing.Set[PlayKey]:
+        return {
+            play_key(play)
+            for play in state.board.iter_valid_plays(domino, order=lambda point: point)
+        }
+
+    def has_valid_play(self, state: Tracked, domino: Domino) -> bool:
+        return state.board.has_valid_play(domino)
+
+    def play(self, state: Tracked, play: Play) -> None:
+        delta = state.board.preview(play)
+        state.score[0] += delta.points
+        state.score[1] += delta.crowns
+        state.board.play(play)
+
+    def discard(self, state: Tracked, domino: Domino) -> None:
+        if Rule.HARMONY in state.board.rules and not state.board.discards:
+            state.score[0] -= BonusPoints.HARMONY
+        state.board.discard(domino)
+
+    def observe(self, state: Tracked) -> Observation:
+        return {
+            "points": state.score[0],
+            "crowns": state.score[1],
+            "bounded": state.board.grid.is_bounded(),
+        }
+
+
+# A domino number and where it went on a board, None for a discard.
+Step = typing.Tuple[int, typing.Optional[PlayKey]]
+
+
+class Divergence(typing.NamedTuple):
+    rules: Rule
+    replay: typing.List[Step]
+    what: str
+    reference: typing.Any
+    candidate: typing.Any
+
+    def __str__(self) -> str:
+        reference, candidate = self.reference, self.candidate
+        if isinstance(reference, set) and isinstance(candidate, set):
+            reference, candidate = reference - candidate, candidate - reference
+        return (
+            f"{self.rules}: {self.what} differs after {self.replay}\n"
+            f"  reference: {reference}\n"
+            f"  candidate: {candidate}"
+        )
+
+
+def all_rules() -> typing.List[Rule]:
+    """Every player count (or mighty duel) with every set of bonus rules."""
+    extras = (Rule.DYNASTY, Rule.MIDDLE_KINGDOM, Rule.HARMONY)
+    return [
+        base | Rule(sum(rule.value for rule in chosen))
+        for base in (
+            Rule.TWO_PLAYERS,
+            Rule.THREE_PLAYERS,
+            Rule.FOUR_PLAYERS,
+            Rule.MIGHTY_DUEL,
+        )
+        for n in range(len(extras) + 1)
+        for chosen in it.combinations(extras, n)
+    ]
+
+
+def check_grids(fills: int = 100, seed: int = 0) -> typing.List[str]:
+    """Compares Grid.is_bounded with the bounded() scan for every
+    GridSize: a single tile on each cell, then random fills of the window
+    around the castle. Returns the mismatches."""
+    rng = random.Random(seed)
+    tile = Tile(Suit.WHEAT)
+    mismatches = []
+
+    def check(grid: Grid, placed: typing.List[Point]) -> None:
+        scanned, tracked = grid.bounded(), grid.is_bounded()
+        if scanned != tracked:
+            mismatches.append(
+                f"size {grid.size} after {placed}: scan {scanned}, tracked {tracked}"
+            )
+
+    for size in GridSize:
+        check(Grid(size), [])
+        for x in range(size * 2 - 1):
+            for y in range(size * 2 - 1):
+                grid = Grid(size)
+                if Point(x, y) != grid.middle:
+                    grid[Point(x, y)] = tile
+                    check(grid, [Point(x, y)])
+
+        for _ in range(fills):
+            grid = Grid(size)
+            corner = Point(
+                rng.randint(0, size - 1),
+                rng.randint(0, size - 1),
+            )
+            window = [
+                Point(corner.x + dx, corner.y + dy)
+                for dx in range(size)
+                for dy in range(size)
+                if Point(corner.x + dx, corner.y + dy) != grid.middle
+            ]
+            rng.shuffle(window)
+            placed = []
+            for point in window[:rng.randint(1, len(window))]:
+                grid[point] = tile
+                placed.append(point)
+                check(grid, placed)
+    return mismatches
+
+
+class Fuzzer:
+    """Plays seeded random games through a reference and a candidate
+    engine in lockstep and stops at the first state they disagree on."""
+
+    def __init__(
+        self,
+        dominoes: Dominoes,
+        reference: Engine = None,
+        candidate: Engine = None,
+    ):
+        self.dominoes = dominoes
+        self.reference = ReferenceEngine() if reference is None else reference
+        self.candidate = IncrementalEngine() if candidate is None else candidate
+        self.seconds = {self.reference.name: 0.0, self.candidate.name: 0.0}
+        self.calls = 0
+
+    def _timed(self, engine: Engine, method: str, *args) -> typing.Any:
+        start = time.perf_counter()
+        result = getattr(engine, method)(*args)
+        self.seconds[engine.name] += time.perf_counter() - start
+        return result
+
+    def _compare(self, method: str, states, *args) -> typing.Tuple[typing.Any, typing.Optional[tuple]]:
+        """Returns the reference result, and (what, reference, candidate)
+        if the candidate disagrees."""
+        self.calls += 1
+        reference = self._timed(self.reference, method, states[0], *args)
+        candidate = self._timed(self.candidate, method, states[1], *args)
+        if reference != candidate:
+            return reference, (method, reference, candidate)
+        return reference, None
+
+    def run(
+        self,
+        rules: Rule,
+        steps: typing.Iterable[typing.Tuple[int, Domino, typing.Union[random.Random, typing.Optional[PlayKey]]]],
+    ) -> typing.Optional[Divergence]:
+        """Places each (board, domino, choice) step on both engines. choice
+        is an rng to pick a random valid play, or the PlayKey to replay."""
+        boards: typing.Dict[int, tuple] = {}
+        replays: typing.Dict[int, typing.List[Step]] = {}
+        for index, domino, choice in steps:
+            if index not in boards:
+                boards[index] = (self.reference.new(rules), self.candidate.new(rules))
+                replays[index] = []
+            states = boards[index]
+            replay = replays[index]
+
+            plays, diverged = self._compare("valid_plays", states, domino)
+            if diverged is None:
+                _, diverged = self._compare("has_valid_play", states, domino)
+            if diverged is not None:
+                replay.append((domino.number, None))
+            else:
+                if isinstance(choice, random.Random):
+                    key = choice.choice(sorted(plays)) if plays else None
+                else:
+                    key = choice
+                if (key is None) != (not plays) or (key is not None and key not in plays):
+                    return None  # A shrunk replay that is no longer legal.
+                replay.append((domino.number, key))
+                for engine, state in zip((self.reference, self.candidate), states):
+                    if key is None:
+                        self._timed(engine, "discard", state, domino)
+                    else:
+                        self._timed(engine, "play", state, play_from_key(domino, key))
+                _, diverged = self._compare("observe", states)
+            if diverged is not None:
+                what, reference, candidate = diverged
+                return Divergence(rules, replay, what, reference, candidate)
+        return None
+
+    def game(self, rules: Rule, seed: int) -> typing.Optional[Divergence]:
+        rng = random.Random(seed)
+        players = 2 if Rule.TWO_PLAYERS in rules or Rule.MIGHTY_DUEL in rules else (
+            3 if Rule.THREE_PLAYERS in rules else 4
+        )
+        per_board = rules.max_turns() * rules.plays_per_turn()
+        count = min(len(self.dominoes), per_board * players)
+        dealt = rng.sample(self.dominoes, count)
+        return self.run(
+            rules,
+            ((i % players, domino, rng) for i, domino in enumerate(dealt)),
+        )
+
+    def shrink(self, divergence: Divergence) -> Divergence:
+        """Drops replay steps one at a time while the engines still diverge."""
+        replay = divergence.replay
+        i = len(replay) - 2
+        while i >= 0:
+            shorter = replay[:i] + replay[i + 1:]
+            found = self.run(
+                divergence.rules,
+                ((0, CATALOGUE[number], key) for number, key in shorter),
+            )
+            if found is not None and found.what == divergence.what:
+                divergence = found
+                replay = found.replay
+            i -= 1
+        return divergence
+
+    def fuzz(self, games: int, seed: int = 0) -> typing.Optional[Divergence]:
+        rules = all_rules()
+        for i in range(games):
+            divergence = self.game(rules[i % len(rules)], seed + i)
+            if divergence is not None:
+                # Boards are independent, so replay only the diverging one.
+                return self.shrink(divergence)
+        return None
+
+    def throughput(self) -> str:
+        reference, candidate = (
+            self.seconds[engine.name] for engine in (self.reference, self.candidate)
+        )
+        return (
+            f"{self.calls} comparisons: "
+            f"{self.reference.name} {self.calls / reference:.0f}/s, "
+            f"{self.candidate.name} {self.calls / candidate:.0f}/s, "
+            f"{self.candidate.name} is {reference / candidate:.2f}x {self.reference.name}"
+        )
+
+
+if __name__ == "__main__":
+
+    filename = "kingdomino.json"
+    dominoes = Dominoes.from_json(filename)
+
+    games = int(sys.argv[1]) if len(sys.argv) >= 2 else 64
+    seed = int(sys.argv[2]) if len(sys.argv) == 3 else 0
+
+    mismatches = check_grids(seed=seed)
+    print("\n".join(mismatches[:10]) or "Grid.is_bounded matches the scan")
+
+    failed = bool(mismatches)
+    for candidate in (BoardEngine(), IncrementalEngine()):
+        fuzzer = Fuzzer(dominoes, candidate=candidate)
+        divergence = fuzzer.fuzz(games, seed)
+        print(divergence if divergence else f"{candidate.name}: {games} games, no divergence")
+        print(fuzzer.throughput())
+        failed = failed or divergence is not None
+
+    sys.exit(1 if failed else 0)
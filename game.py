@@ -7,6 +7,10 @@ import sys
 import typing
 import unionfind
 
+if typing.TYPE_CHECKING:
+    import agents
+    import openingbook
+
 
 class InvalidPlay(ValueError):
     pass
@@ -83,6 +87,18 @@ class Rule(enum.Flag):
         if num_players == 4:
             return cls.FOUR_PLAYERS
 
+    def max_turns(self) -> MaxTurns:
+        if Rule.TWO_PLAYERS in self:
+            return MaxTurns.TWO_PLAYERS
+        elif Rule.MIGHTY_DUEL in self:
+            return MaxTurns.MIGHTY_DUEL
+        else:
+            return MaxTurns.STANDARD
+
+    def plays_per_turn(self) -> int:
+        """Each player has two kings, so places two dominoes, with two players."""
+        return 2 if Rule.TWO_PLAYERS in self else 1
+
 
 class Suit(enum.Enum):
     FOREST = enum.auto()
@@ -211,16 +227,79 @@ class Domino(typing.NamedTuple):
     def __repr__(self):
         return f"{self.left.suit.colored_print(self.left.crowns)}{self.right.suit.colored_print(self.left.crowns)}"
 
+    # Dominoes are interned by number, so the number is the identity.
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Domino):
+            return self.number == other.number
+        return NotImplemented
+
+    def __ne__(self, other: object) -> bool:
+        if isinstance(other, Domino):
+            return self.number != other.number
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return self.number
+
+
+class Catalogue:
+    """Every known domino by number, with a single instance per number and
+    per tile, and flat tables of their suits and crowns indexed by number."""
+
+    def __init__(self):
+        self.dominoes: typing.List[typing.Optional[Domino]] = []
+        self.suits: typing.List[typing.Optional[typing.Tuple[Suit, Suit]]] = []
+        self.crowns: typing.List[typing.Optional[typing.Tuple[int, int]]] = []
+        self.tiles: typing.Dict[typing.Tuple[Suit, int], Tile] = {}
+
+    def tile(self, suit: Suit, crowns: int = 0) -> Tile:
+        return self.tiles.setdefault((suit, crowns), Tile(suit, crowns))
+
+    def intern(self, number: int, left: Tile, right: Tile) -> Domino:
+        if number in self:
+            domino = self.dominoes[number]
+            if (domino.left, domino.right) != (left, right):
+                raise ValueError(f"Domino {number} is already {domino!r}")
+            return domino
+
+        missing = number + 1 - len(self.dominoes)
+        if missing > 0:
+            self.dominoes.extend([None] * missing)
+            self.suits.extend([None] * missing)
+            self.crowns.extend([None] * missing)
+        left = self.tile(*left)
+        right = self.tile(*right)
+        domino = self.dominoes[number] = Domino(number, left, right)
+        self.suits[number] = (left.suit, right.suit)
+        self.crowns[number] = (left.crowns, right.crowns)
+        return domino
+
+    def __contains__(self, number: int) -> bool:
+        return 0 <= number < len(self.dominoes) and self.dominoes[number] is not None
+
+    def __getitem__(self, number: int) -> Domino:
+        if number not in self:
+            raise KeyError(number)
+        return self.dominoes[number]
+
+    def resolve(self, domino: typing.Union[int, Domino]) -> Domino:
+        """Returns the domino for a number, or the domino itself."""
+        return self[domino] if isinstance(domino, int) else domino
+
+
+CATALOGUE = Catalogue()
+
 
 class Play:
 
     def __init__(
         self,
-        domino: Domino,
+        domino: typing.Union[int, Domino],
         point: Point,
         direction: Direction,
     ):
-        self.domino = domino
+        self.domino = CATALOGUE.resolve(domino)
         self.point = point
         self.direction = direction
         self.points = (self.point, self.point + self.direction)
@@ -268,7 +347,7 @@ class Play:
         )
 
     def __hash__(self):
-        return hash((self.domino, self.point, self.direction))
+        return hash((self.domino.number, self.point, self.direction))
 
     @classmethod
     def flipped(cls, play):
@@ -282,6 +361,13 @@ class Play:
         return f"{self.point.x} {self.point.y} {self.direction.name[:4]}"
 
 
+class ScoreDelta(typing.NamedTuple):
+    points: int
+    crowns: int
+    regions: int
+    bonus: int
+
+
 class Grid:
 
     def __init__(self, size: int):
@@ -298,6 +384,9 @@ class Grid:
         self.min_x = half
         self.min_y = half
 
+        # Kept up to date by __setitem__ for is_bounded.
+        self.unbounded = False
+
     def __getitem__(self, point: Point) -> typing.Optional[Tile]:
         try:
             return self.grid[point.x][point.y]
@@ -307,8 +396,22 @@ class Grid:
     def __setitem__(self, point: Point, tile: Tile) -> None:
         self.min_x, self.min_y = self.min(point)
         self.max_x, self.max_y = self.max(point)
+        self.unbounded = self.unbounded or self.unbounds(point)
         self.grid[point.x][point.y] = tile
 
+    def copy(self) -> "Grid":
+        grid = self.__class__.__new__(self.__class__)
+        grid.__dict__.update(self.__dict__)
+        grid.grid = [row[:] for row in self.grid]
+        return grid
+
+    def tiles(self) -> typing.Iterator[typing.Tuple[Point, Tile]]:
+        for x in range(self.min_x, self.max_x + 1):
+            for y in range(self.min_y, self.max_y + 1):
+                tile = self.grid[x][y]
+                if tile is not None:
+                    yield Point(x, y), tile
+
     def min(self, point: Point) -> Point:
         return Point(min(self.min_x, point.x), min(self.min_y, point.y))
 
@@ -340,6 +443,24 @@ class Grid:
             for i in range(2,  self.max_size - 1)
         )
 
+    def unbounds(self, point: Point) -> bool:
+        """Returns True if a tile at point makes bounded() False."""
+        scanned = range(2, self.max_size - 1)
+        return (
+            (point.x in (1, self.size - 2) and point.y in scanned)
+            or (point.y in (1, self.size - 2) and point.x in scanned)
+        )
+
+    def is_bounded(self) -> bool:
+        """Same as bounded(), in constant time."""
+        return not self.unbounded
+
+    def within_box(self, point: Point) -> bool:
+        return (
+            self.min_x <= point.x <= self.max_x
+            and self.min_y <= point.y <= self.max_y
+        )
+
     def __str__(self):
         return "".join(
             (
@@ -358,6 +479,67 @@ class Grid:
         )
 
 
+class Space:
+    """Incrementally tracks vacant cells inside the bounding box that no
+    domino can ever fill, because none of their neighbours can still take a
+    tile.
+
+    Dead cells stay dead: neighbours only fill up and the window in which
+    tiles may go only shrinks."""
+
+    def __init__(self):
+        self.dead: typing.Set[Point] = set()
+
+    def copy(self) -> "Space":
+        space = self.__class__()
+        space.dead = set(self.dead)
+        return space
+
+    def update(
+        self,
+        grid: Grid,
+        points: typing.Iterable[Point],
+        box: typing.Tuple[int, int, int, int],
+    ) -> None:
+        """Accounts for tiles just placed at points. box is the
+        (min_x, min_y, max_x, max_y) bounding box before they were."""
+        candidates = set()
+        for point in points:
+            candidates.update(point.adjacent_points())
+
+        if box != (grid.min_x, grid.min_y, grid.max_x, grid.max_y):
+            # The window may have shrunk onto the box, cutting off its rim.
+            for x in range(grid.min_x, grid.max_x + 1):
+                candidates.update((Point(x, grid.min_y), Point(x, grid.max_y)))
+            for y in range(grid.min_y, grid.max_y + 1):
+                candidates.update((Point(grid.min_x, y), Point(grid.max_x, y)))
+
+        for point in candidates:
+            if (
+                point not in self.dead
+                and grid.within_box(point)
+                and grid[point] is None
+                and not any(
+                    grid.within_grid_and_bounds(adjacent)
+                    and grid[adjacent] is None
+                    for adjacent in point.adjacent_points()
+                )
+            ):
+                self.dead.add(point)
+
+
+SYMMETRIES: typing.Tuple[typing.Callable[[int, int], typing.Tuple[int, int]], ...] = (
+    lambda dx, dy: (dx, dy),
+    lambda dx, dy: (dy, dx),
+    lambda dx, dy: (-dx, dy),
+    lambda dx, dy: (dx, -dy),
+    lambda dx, dy: (-dx, -dy),
+    lambda dx, dy: (-dy, dx),
+    lambda dx, dy: (dy, -dx),
+    lambda dx, dy: (-dy, -dx),
+)
+
+
 class Board:
 
     def __init__(
@@ -376,12 +558,63 @@ class Board:
             union = unionfind.UnionFind()
         self.union = union
 
+        self.played: typing.List[Play] = []
+        self.space = Space()
+
         self.grid = Grid(
             GridSize.MIGHTY_DUEL
             if Rule.MIGHTY_DUEL in self.rules
             else GridSize.STANDARD
         )
 
+    def copy(self) -> "Board":
+        board = self.__class__.__new__(self.__class__)
+        board.__dict__.update(self.__dict__)
+        board.discards = self.discards[:]
+        board.played = self.played[:]
+        board.space = self.space.copy()
+        board.union = self.union.copy()
+        board.grid = self.grid.copy()
+        return board
+
+    def key(self) -> tuple:
+        """Returns a hashable key shared by all boards that score and play
+        identically, up to the symmetries that preserve the scoring rules."""
+        middle = self.grid.middle
+        tiles = [
+            (
+                point.x - middle.x,
+                point.y - middle.y,
+                tile,
+                self.union.find(point) if point in self.union else None,
+            )
+            for point, tile in self.grid.tiles()
+            if tile.suit != Suit.CASTLE
+        ]
+        # Grid.bounded only looks at the near side of each axis, so with the
+        # middle kingdom rule only the diagonal reflection keeps the score.
+        symmetries = SYMMETRIES[:2] if Rule.MIDDLE_KINGDOM in self.rules else SYMMETRIES
+        keys = []
+        for symmetry in symmetries:
+            cells = [
+                (symmetry(dx, dy), tile, root)
+                for dx, dy, tile, root in tiles
+            ]
+            labels: typing.Dict[Point, tuple] = {}
+            for cell, tile, root in cells:
+                if root is not None and (
+                    root not in labels or cell < labels[root]
+                ):
+                    labels[root] = cell
+            keys.append(tuple(sorted(
+                (cell, tile.suit.value, tile.crowns, labels[root] if root is not None else ())
+                for cell, tile, root in cells
+            )))
+        return (
+            min(keys),
+            Rule.HARMONY in self.rules and not self.discards,
+        )
+
     # SCORING
 
     def crowns_and_tiles(self) -> typing.List[typing.Tuple[int, int]]:
@@ -413,7 +646,7 @@ class Board:
         return (
             BonusPoints.MIDDLE_KINGDOM
             * int(Rule.MIDDLE_KINGDOM in self.rules)
-            * int(self.grid.bounded())
+            * int(self.grid.is_bounded())
         )
 
     def harmony_points(self):
@@ -423,6 +656,106 @@ class Board:
             * int(not self.discards)
         )
 
+    # PREVIEW
+
+    def preview(self, play: Play) -> ScoreDelta:
+        """Returns how points(), crowns(), the number of regions and the
+        bonuses would change if the valid play were played, without
+        playing it."""
+        tiles = dict(zip(play.points, (play.domino.left, play.domino.right)))
+        parent: typing.Dict[Point, Point] = {}
+        sizes: typing.Dict[Point, int] = {}
+        weights: typing.Dict[Point, int] = {}
+        old_roots = set()
+
+        def group(point: Point) -> Point:
+            if point in tiles:
+                root, size, weight = point, 1, tiles[point].crowns
+            elif point in self.union:
+                root = self.union.find(point)
+                size, weight = self.union.size(root), self.union.weight(root)
+                old_roots.add(root)
+            else:
+                root, size, weight = point, 1, self.grid[point].crowns
+            if root not in parent:
+                parent[root] = root
+                sizes[root] = size
+                weights[root] = weight
+            return find(root)
+
+        def find(point: Point) -> Point:
+            while parent[point] != point:
+                point = parent[point]
+            return point
+
+        for a, b in play.adjacent_edges():
+            grid_tile = self.grid[b]
+            if grid_tile is None or tiles[a].suit != grid_tile.suit:
+                continue
+            root_a, root_b = group(a), group(b)
+            if root_a != root_b:
+                parent[root_b] = root_a
+                sizes[root_a] += sizes[root_b]
+                weights[root_a] += weights[root_b]
+
+        new_roots = {find(point) for point in parent}
+        bonus = 0
+        if self.middle_kingdom_achievable() and any(
+            self.grid.unbounds(point) for point in play.points
+        ):
+            bonus = -BonusPoints.MIDDLE_KINGDOM
+        return ScoreDelta(
+            points=(
+                sum(sizes[root] * weights[root] for root in new_roots)
+                - sum(sizes[root] * weights[root] for root in old_roots)
+                + bonus
+            ),
+            crowns=(
+                sum(weights[root] for root in new_roots)
+                - sum(weights[root] for root in old_roots)
+            ),
+            regions=len(new_roots) - len(old_roots),
+            bonus=bonus,
+        )
+
+    def ranked_plays(
+        self,
+        domino: Domino,
+    ) -> typing.List[typing.Tuple[ScoreDelta, Play]]:
+        """Returns valid_plays with their previews, most points first."""
+        return sorted(
+            (
+                (self.preview(play), play)
+                for play in self.valid_plays(domino)
+            ),
+            key=lambda entry: entry[0].points,
+            reverse=True,
+        )
+
+    # SPACE
+
+    def dead_cells(self) -> int:
+        return len(self.space.dead)
+
+    def fillable_cells(self) -> int:
+        """Upper bound on the cells still to be filled in the final kingdom."""
+        return (
+            self.grid.size * self.grid.size
+            - 1
+            - 2 * len(self.played)
+            - len(self.space.dead)
+        )
+
+    # BONUSES
+
+    def middle_kingdom_achievable(self) -> bool:
+        """Grid.bounded() only looks at where tiles are, so the bonus stays
+        achievable until a tile lands on a cell it scans."""
+        return Rule.MIDDLE_KINGDOM in self.rules and self.grid.is_bounded()
+
+    def harmony_achievable(self) -> bool:
+        return Rule.HARMONY in self.rules and not self.discards
+
     # PLAYING
 
     def discard(self, domino: Domino) -> None:
@@ -432,8 +765,11 @@ class Board:
         if not self.valid_play(play):
             raise InvalidPlay
 
+        box = (self.grid.min_x, self.grid.min_y, self.grid.max_x, self.grid.max_y)
         self.add_to_grid(play)
         self._unionise(play)
+        self.played.append(play)
+        self.space.update(self.grid, play.points, box)
 
     def valid_play(self, play: Play):
         return all(
@@ -482,6 +818,8 @@ class Board:
             if grid_tile is None:
                 continue
             if domino_tile.suit == grid_tile.suit:
+                self.union.add(a, domino_tile.crowns)
+                self.union.add(b, grid_tile.crowns)
                 self.union.join(a, b)
 
     # VALIDATION
@@ -493,11 +831,24 @@ class Board:
             direction: typing.Optional[Direction] = None
     ) -> typing.Set[Play]:
         """Returns a list of all valid plays given a Play containing a domino."""
+        return set(self.iter_valid_plays(domino, point, direction))
+
+    def iter_valid_plays(
+            self,
+            domino: Domino,
+            point: typing.Optional[Point] = None,
+            direction: typing.Optional[Direction] = None,
+            order: typing.Optional[typing.Callable[[Point], typing.Any]] = None,
+    ) -> typing.Iterator[Play]:
+        """Yields the plays of valid_plays one at a time, trying vacant
+        points outwards from the castle or sorted by order."""
         if domino is None:
-            return set()
-        valid = set()
+            return
+        seen = set()
         directions = (direction,) if direction else Direction
         points = (point,) if point else self._vacant_points()
+        if order is not None:
+            points = sorted(set(points), key=order)
         for point in points:
             for direction in directions:
                 new_play = Play(
@@ -505,13 +856,13 @@ class Board:
                     point=point,
                     direction=direction
                 )
-                if self.valid_play(new_play):
-                    valid.add(new_play)
-                flipped = Play.flipped(new_play)
-                if self.valid_play(flipped):
-                    valid.add(flipped)
+                for play in (new_play, Play.flipped(new_play)):
+                    if play not in seen and self.valid_play(play):
+                        seen.add(play)
+                        yield play
 
-        return valid
+    def has_valid_play(self, domino: Domino) -> bool:
+        return next(self.iter_valid_plays(domino), None) is not None
 
     def _vacant_points(self) -> typing.List[Point]:
         vacant_points = []
@@ -543,15 +894,18 @@ class Line:
 
     def __init__(
         self,
-        dominos: typing.List[Domino]
+        dominos: typing.List[typing.Union[int, Domino]]
     ):
         self.line = [
             [None, domino]
-            for domino in sorted(dominos)
+            for domino in sorted(map(CATALOGUE.resolve, dominos))
         ]
+        self.entries = {entry[1].number: entry for entry in self.line}
 
     def pop(self) -> Domino:
-        return self.line.pop(0)
+        entry = self.line.pop(0)
+        del self.entries[entry[1].number]
+        return entry
 
     def empty(self) -> bool:
         return not self.line
@@ -560,12 +914,13 @@ class Line:
         self,
         player: Player,
         index: int = None,
-        domino: Domino = None,
+        domino: typing.Union[int, Domino] = None,
     ) -> None:
-        # TODO: Refactor
         if domino is not None:
-            index = self.line.index(domino)
-        self.line[index][0] = player
+            # Raises KeyError for a domino that is not, or no longer, in line.
+            self.entries[CATALOGUE.resolve(domino).number][0] = player
+        else:
+            self.line[index][0] = player
 
     def __str__(self):
         return "\n".join(
@@ -620,7 +975,7 @@ class Dominoes(list):
         with open(filename) as f:
             dominos = json.load(f)
             return cls(
-                Domino(
+                CATALOGUE.intern(
                     number=int(domino["number"]),
                     left=Tile(
                         suit=Suit.from_string(domino["left"]["suit"]),
@@ -645,7 +1000,10 @@ class Deck:
     ):
         self.deck_size = deck_size
         self.draw_num = draw_num
-        self.deck = random.sample(dominoes, self.deck_size)
+        self.deck = [
+            CATALOGUE.resolve(domino)
+            for domino in random.sample(dominoes, self.deck_size)
+        ]
 
     def empty(self):
         return not bool(self.deck)
@@ -668,8 +1026,14 @@ class Game:
         dominoes: Dominoes,
         players: typing.List[Player],
         rules: Rule = None,
+        agents: typing.Dict[Player, "agents.Agent"] = None,
+        book: "openingbook.OpeningBook" = None,
     ):
         self.players = players
+        if agents is None:
+            agents = {}
+        self.agents = agents
+        self.book = book
         self.rules = Rule.default(len(self.players))
         self.add_rules(rules)
 
@@ -691,12 +1055,7 @@ class Game:
             self.rules |= rules
 
     def max_turns(self):
-        if Rule.TWO_PLAYERS in self.rules:
-            return MaxTurns.TWO_PLAYERS
-        elif Rule.MIGHTY_DUEL in self.rules:
-            return MaxTurns.MIGHTY_DUEL
-        else:
-            return MaxTurns.STANDARD
+        return self.rules.max_turns()
 
     def deck_size(self):
         turns = self.max_turns() * len(self.players)
@@ -733,6 +1092,12 @@ class Game:
     def select(self):
         while self.order:
             player = self.order.pop(0)
+            if player in self.agents:
+                self.line.choose(
+                    player,
+                    self.agents[player].select(self, player),
+                )
+                continue
             print(self.line)
             print(self.boards[player])
             while True:
@@ -750,16 +1115,28 @@ class Game:
         while not self.line.empty():
             player, domino = self.line.pop()
             board = self.boards[player]
+            self.order.append(player)
+
+            if player in self.agents:
+                play = self.agents[player].place(self, player, domino)
+                if play is None:
+                    board.discard(domino)
+                else:
+                    board.play(play)
+                continue
 
             print(board)
             print(domino)
+            if self.book is not None:
+                hint = self.book.play(board, domino)
+                if hint is not None:
+                    print(f"Book: {hint}")
+            if not board.has_valid_play(domino):
+                board.discard(domino)
+                continue
+            print(board.valid_plays(domino))
             while True:
                 try:
-                    plays = board.valid_plays(domino)
-                    if not plays:
-                        board.discard(domino)
-                        break
-                    print(plays)
                     x, y, direction = input("x y direction: ").split()
                     board.play(
                         Play(
@@ -773,8 +1150,6 @@ class Game:
                 else:
                     break
 
-            self.order.append(player)
-
     def turn(self):
         print(f"Turn {self.turn_num}/{self.max_turns()}")
         self.draw()
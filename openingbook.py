@@ -0,0 +1,150 @@
+import json
+import sys
+import typing
+from game import Board, Direction, Domino, Dominoes, Play, Point, Rule
+from planner import Planner
+
+
+class Entry(typing.NamedTuple):
+    point: Point
+    direction: Direction
+    score: float
+
+    def to_play(self, domino: Domino) -> Play:
+        return Play(domino=domino, point=self.point, direction=self.direction)
+
+
+class OpeningBook:
+    """Best placements for the first two dominoes on an empty board.
+
+    first is keyed by (rules, number) and scores each placement by the mean
+    best points over every second domino. second is keyed by
+    (rules, first number, second number) and assumes the first domino was
+    placed where the book says."""
+
+    def __init__(
+        self,
+        first: typing.Dict[typing.Tuple[int, int], Entry] = None,
+        second: typing.Dict[typing.Tuple[int, int, int], Entry] = None,
+    ):
+        if first is None:
+            first = {}
+        self.first = first
+        if second is None:
+            second = {}
+        self.second = second
+
+    def entry(self, board: Board, domino: Domino) -> typing.Optional[Entry]:
+        if board.discards or len(board.played) > 1:
+            return None
+        rules = board.rules.value
+        if not board.played:
+            return self.first.get((rules, domino.number))
+
+        played = board.played[0]
+        first = self.first.get((rules, played.domino.number))
+        # Not Play equality, which also matches the flipped placement.
+        if first is None or (first.point, first.direction) != (played.point, played.direction):
+            return None
+        return self.second.get((rules, played.domino.number, domino.number))
+
+    def play(self, board: Board, domino: Domino) -> typing.Optional[Play]:
+        entry = self.entry(board, domino)
+        return None if entry is None else entry.to_play(domino)
+
+    def score(self, board: Board, domino: Domino) -> typing.Optional[float]:
+        entry = self.entry(board, domino)
+        return None if entry is None else entry.score
+
+    # BUILDING
+
+    @classmethod
+    def build(
+        cls,
+        rules: typing.Iterable[Rule],
+        dominoes: Dominoes,
+    ) -> "OpeningBook":
+        book = cls()
+        for rule in rules:
+            planner = Planner(rule)
+            empty = Board(rules=rule)
+            for first in dominoes:
+                seconds = [domino for domino in dominoes if domino != first]
+                candidates = {
+                    child.key(): (play, child)
+                    for play, child in planner.children(empty, first)
+                    if play is not None
+                }
+                best = None
+                for play, child in candidates.values():
+                    plans = {
+                        second.number: planner.solve([second], child)
+                        for second in seconds
+                    }
+                    score = sum(plan.score for plan in plans.values()) / len(plans)
+                    if best is None or score > best[0]:
+                        best = (score, play, plans)
+                if best is None:
+                    continue
+
+                score, play, plans = best
+                book.first[(rule.value, first.number)] = Entry(
+                    play.point, play.direction, score
+                )
+                for number, plan in plans.items():
+                    if plan.plays[0] is not None:
+                        book.second[(rule.value, first.number, number)] = Entry(
+                            plan.plays[0].point, plan.plays[0].direction, plan.score
+                        )
+        return book
+
+    # SERIALISATION
+
+    def to_dict(self) -> typing.Dict[str, typing.List[list]]:
+        return {
+            "first": [
+                [rules, number, *entry.point, entry.direction.name.lower(), entry.score]
+                for (rules, number), entry in sorted(self.first.items())
+            ],
+            "second": [
+                [rules, first, second, *entry.point, entry.direction.name.lower(), entry.score]
+                for (rules, first, second), entry in sorted(self.second.items())
+            ],
+        }
+
+    def to_json(self, filename: str) -> None:
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def from_json(cls, filename: str) -> "OpeningBook":
+        with open(filename) as f:
+            book = json.load(f)
+            return cls(
+                first={
+                    (rules, number): Entry(
+                        Point(x, y), Direction.from_string(direction), score
+                    )
+                    for rules, number, x, y, direction, score in book["first"]
+                },
+                second={
+                    (rules, first, second): Entry(
+                        Point(x, y), Direction.from_string(direction), score
+                    )
+                    for rules, first, second, x, y, direction, score in book["second"]
+                },
+            )
+
+
+if __name__ == "__main__":
+
+    filename = sys.argv[1] if len(sys.argv) >= 2 else "kingdomino.json"
+    output = sys.argv[2] if len(sys.argv) == 3 else "openingbook.json"
+
+    dominoes = Dominoes.from_json(filename)
+    book = OpeningBook.build(
+        (Rule.TWO_PLAYERS, Rule.FOUR_PLAYERS, Rule.MIGHTY_DUEL),
+        dominoes,
+    )
+    book.to_json(output)
+    print(f"{output}: {len(book.first)} first and {len(book.second)} second placements")
@@ -0,0 +1,194 @@
+import random
+import sys
+import time
+import typing
+from game import Board, Domino, Dominoes, Play, Rule
+
+if typing.TYPE_CHECKING:
+    import tablebase
+
+
+class Timeout(Exception):
+    pass
+
+
+class Plan(typing.NamedTuple):
+    score: float
+    plays: typing.List[typing.Optional[Play]]
+    nodes: int
+    seconds: float
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds else float("inf")
+
+
+class Planner:
+    """Finds the best final Board.points() for dominoes placed in a known
+    order. A None play in the result means the domino had to be discarded.
+
+    Without a beam width the search is exact: a depth first search memoised
+    on Board.key(). With a beam width only the best boards of each ply are
+    kept. Leaves and beams are scored by evaluate, Board.points by default;
+    pass a heuristic when the game goes on after the last domino.
+
+    With a depth only the first that many dominoes are searched.
+
+    The exact search reads the last plies from a tablebase when given one.
+    Tablebases hold final Board.points() for whole games, so they are only
+    read when evaluate is Board.points and there is no depth."""
+
+    def __init__(
+        self,
+        rules: Rule,
+        beam_width: typing.Optional[int] = None,
+        evaluate: typing.Callable[[Board], float] = None,
+        tablebase: "tablebase.Tablebase" = None,
+        depth: typing.Optional[int] = None,
+    ):
+        self.rules = rules
+        self.beam_width = beam_width
+        if evaluate is None:
+            evaluate = Board.points
+        self.evaluate = evaluate
+        self.depth = depth
+        if evaluate is not Board.points or depth is not None:
+            tablebase = None
+        self.tablebase = tablebase
+        self.deadline: typing.Optional[float] = None
+        self.stop: typing.Optional[typing.Callable[[], bool]] = None
+        self.nodes = 0
+
+    def solve(
+        self,
+        dominoes: typing.Sequence[Domino],
+        board: Board = None,
+        deadline: typing.Optional[float] = None,
+        stop: typing.Optional[typing.Callable[[], bool]] = None,
+    ) -> Plan:
+        """Raises Timeout once time.perf_counter() passes deadline or stop()
+        returns True."""
+        self.deadline = deadline
+        self.stop = stop
+        if board is None:
+            board = Board(rules=self.rules)
+        if self.depth is not None:
+            dominoes = dominoes[:self.depth]
+        self.nodes = 0
+        start = time.perf_counter()
+        if self.beam_width is None:
+            score, plays = self._exact(board, dominoes)
+        else:
+            score, plays = self._beam(board, dominoes)
+        return Plan(
+            score=score,
+            plays=plays,
+            nodes=self.nodes,
+            seconds=time.perf_counter() - start,
+        )
+
+    def children(
+        self,
+        board: Board,
+        domino: Domino,
+    ) -> typing.Iterator[typing.Tuple[typing.Optional[Play], Board]]:
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise Timeout
+        if self.stop is not None and self.stop():
+            raise Timeout
+        self.nodes += 1
+        discard = True
+        for play in board.iter_valid_plays(domino):
+            discard = False
+            child = board.copy()
+            child.play(play)
+            yield play, child
+        if discard:
+            child = board.copy()
+            child.discard(domino)
+            yield None, child
+
+    # EXACT
+
+    def _exact(
+        self,
+        board: Board,
+        dominoes: typing.Sequence[Domino],
+    ) -> typing.Tuple[int, typing.List[typing.Optional[Play]]]:
+        memo: typing.Dict[tuple, int] = {}
+        score = self._best(board, dominoes, 0, memo)
+
+        # Walk the memo back down to recover the plays on the real board.
+        plays = []
+        for i, domino in enumerate(dominoes):
+            for play, child in self.children(board, domino):
+                if self._best(child, dominoes, i + 1, memo) == score:
+                    plays.append(play)
+                    board = child
+                    break
+        return score, plays
+
+    def _best(
+        self,
+        board: Board,
+        dominoes: typing.Sequence[Domino],
+        i: int,
+        memo: typing.Dict[tuple, int],
+    ) -> int:
+        if i == len(dominoes):
+            return self.evaluate(board)
+        if (
+            self.tablebase is not None
+            and len(dominoes) - i == self.tablebase.plies
+        ):
+            score = self.tablebase.lookup(board, dominoes[i:])
+            if score is not None:
+                return score
+        key = (board.key(), i)
+        if key not in memo:
+            memo[key] = max(
+                self._best(child, dominoes, i + 1, memo)
+                for _, child in self.children(board, dominoes[i])
+            )
+        return memo[key]
+
+    # BEAM
+
+    def _beam(
+        self,
+        board: Board,
+        dominoes: typing.Sequence[Domino],
+    ) -> typing.Tuple[int, typing.List[typing.Optional[Play]]]:
+        beam: typing.List[typing.Tuple[Board, typing.List[typing.Optional[Play]]]] = [
+            (board, [])
+        ]
+        for domino in dominoes:
+            seen: typing.Dict[tuple, typing.Tuple[float, Board, list]] = {}
+            for parent, plays in beam:
+                for play, child in self.children(parent, domino):
+                    key = child.key()
+                    if key not in seen:
+                        seen[key] = (self.evaluate(child), child, plays + [play])
+            ranked = sorted(seen.values(), key=lambda entry: entry[0], reverse=True)
+            beam = [(child, plays) for _, child, plays in ranked[:self.beam_width]]
+
+        scored = [(self.evaluate(board), plays) for board, plays in beam]
+        return max(scored, key=lambda entry: entry[0])
+
+
+if __name__ == "__main__":
+
+    filename = "kingdomino.json"
+    dominoes = Dominoes.from_json(filename)
+
+    random.seed(0)
+    num = int(sys.argv[1]) if len(sys.argv) == 2 else 4
+    sequence = random.sample(dominoes, num)
+    print(sequence)
+
+    for beam_width in (None, 8, 64):
+        plan = Planner(Rule.TWO_PLAYERS, beam_width=beam_width).solve(sequence)
+        print(
+            f"beam={beam_width} score={plan.score} plays={plan.plays} "
+            f"nodes={plan.nodes} nodes/s={plan.nodes_per_second:.0f}"
+        )
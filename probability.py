@@ -0,0 +1,142 @@
+import numpy as np
+import random
+import typing
+from game import Board, Domino, Dominoes, DrawNum, Game, Line, Suit
+
+
+SUITS = tuple(suit for suit in Suit if suit not in (Suit.CASTLE, Suit.NONE))
+SUIT_INDEX = {suit: i for i, suit in enumerate(SUITS)}
+
+
+class DeckModel:
+    """Tracks which dominoes of the catalogue have not been seen yet.
+
+    The next Line is a uniform sample of draw_num of the unseen dominoes,
+    whether they are still in the Deck or were left in the box, so every
+    query is an exact hypergeometric over the unseen set.
+
+    Every query also takes an explicit unseen mask of shape (n,) or (m, n)
+    to evaluate many hypothetical decks at once."""
+
+    def __init__(
+        self,
+        dominoes: Dominoes,
+        draw_num: int = DrawNum.FOUR,
+    ):
+        self.dominoes = list(dominoes)
+        self.draw_num = draw_num
+        self.index = {domino.number: i for i, domino in enumerate(self.dominoes)}
+
+        self.crowns = np.zeros((len(self.dominoes), len(SUITS)), dtype=np.int64)
+        self.tiles = np.zeros((len(self.dominoes), len(SUITS)), dtype=np.int64)
+        for i, domino in enumerate(self.dominoes):
+            for tile in (domino.left, domino.right):
+                self.crowns[i, SUIT_INDEX[tile.suit]] += tile.crowns
+                self.tiles[i, SUIT_INDEX[tile.suit]] += 1
+        self.crowned = self.crowns > 0
+
+        self.unseen = np.ones(len(self.dominoes), dtype=bool)
+
+    @classmethod
+    def from_game(cls, game: Game, dominoes: Dominoes) -> "DeckModel":
+        model = cls(dominoes, game.deck.draw_num)
+        model.observe(game.boards.values(), getattr(game, "line", None))
+        return model
+
+    # OBSERVING
+
+    def see(self, dominoes: typing.Iterable[Domino]) -> None:
+        for domino in dominoes:
+            self.unseen[self.index[domino.number]] = False
+
+    def observe(
+        self,
+        boards: typing.Iterable[Board] = (),
+        line: typing.Optional[Line] = None,
+    ) -> None:
+        for board in boards:
+            self.see(play.domino for play in board.played)
+            self.see(board.discards)
+        if line is not None:
+            self.see(domino for _, domino in line.line)
+
+    def mask(self, dominoes: typing.Iterable[Domino]) -> np.ndarray:
+        mask = np.zeros(len(self.dominoes), dtype=bool)
+        for domino in dominoes:
+            mask[self.index[domino.number]] = True
+        return mask
+
+    def remaining(self, unseen: np.ndarray = None) -> np.ndarray:
+        if unseen is None:
+            unseen = self.unseen
+        return unseen.sum(axis=-1)
+
+    # QUERIES
+
+    def _none_drawn(self, matching: np.ndarray, remaining: np.ndarray) -> np.ndarray:
+        """P(none of the matching unseen dominoes are in the next draw)."""
+        i = np.arange(self.draw_num)
+        left = remaining[..., None] - i
+        missed = left - matching[..., None]
+        factors = np.where(
+            left > 0,
+            np.where(missed > 0, missed / np.maximum(left, 1), 0.0),
+            1.0,
+        )
+        return factors.prod(axis=-1)
+
+    def probability_any(
+        self,
+        mask: np.ndarray,
+        unseen: np.ndarray = None,
+    ) -> np.ndarray:
+        """P(at least one domino of mask is in the next draw)."""
+        if unseen is None:
+            unseen = self.unseen
+        return 1 - self._none_drawn(
+            (mask & unseen).sum(axis=-1),
+            self.remaining(unseen),
+        )
+
+    def probability_crowned(self, unseen: np.ndarray = None) -> np.ndarray:
+        """P(some domino with a crowned tile of each suit is in the next
+        draw), indexed by SUIT_INDEX."""
+        if unseen is None:
+            unseen = self.unseen
+        return 1 - self._none_drawn(
+            unseen.astype(np.int64) @ self.crowned,
+            self.remaining(unseen)[..., None],
+        )
+
+    def _expected(self, values: np.ndarray, unseen: np.ndarray = None) -> np.ndarray:
+        if unseen is None:
+            unseen = self.unseen
+        remaining = self.remaining(unseen)[..., None]
+        drawn = np.minimum(self.draw_num, remaining)
+        return (unseen.astype(np.int64) @ values) * drawn / np.maximum(remaining, 1)
+
+    def expected_crowns(self, unseen: np.ndarray = None) -> np.ndarray:
+        """Expected crowns per suit in the next draw, indexed by SUIT_INDEX."""
+        return self._expected(self.crowns, unseen)
+
+    def expected_tiles(self, unseen: np.ndarray = None) -> np.ndarray:
+        """Expected tiles per suit in the next draw, indexed by SUIT_INDEX."""
+        return self._expected(self.tiles, unseen)
+
+
+if __name__ == "__main__":
+
+    filename = "kingdomino.json"
+    dominoes = Dominoes.from_json(filename)
+
+    random.seed(0)
+
+    model = DeckModel(dominoes)
+    model.see(random.sample(dominoes, 20))
+    print(f"{model.remaining()} unseen")
+    for suit, p, crowns in zip(
+        SUITS,
+        model.probability_crowned(),
+        model.expected_crowns(),
+    ):
+        print(f"{suit.to_string():>6}: P(crowned)={p:.3f} E(crowns)={crowns:.3f}")
@@ -0,0 +1,472 @@
+import itertools as it
+import math
+import random
+import sys
+import time
+import typing
+from game import Board, Domino, Dominoes, DrawNum, Game, Play, Player, Rule
+
+
+Evaluate = typing.Callable[[Board], float]
+Ranked = typing.Callable[[Board, Domino], typing.List[Play]]
+
+
+def ranked_plays(board: Board, domino: Domino) -> typing.List[Play]:
+    return [play for _, play in board.ranked_plays(domino)]
+
+
+class Move(typing.NamedTuple):
+    """Pick the domino in slot of the line and place it, None to discard."""
+    slot: int
+    play: typing.Optional[Play]
+
+
+class Position:
+    """A game between picks, with what every player can see: all boards,
+    the line and its picks, who still picks this turn and the dominoes that
+    have not been seen yet. The order of the deck is not known.
+
+    Picking and placing are one move, as a placement only changes the
+    picker's board. Once everybody has picked, the next turn's order is
+    the order of the picked slots and the position becomes a chance node
+    until the next line is drawn. Dominoes nobody picked leave the game."""
+
+    def __init__(
+        self,
+        rules: Rule,
+        boards: typing.Tuple[Board, ...],
+        unseen: typing.Tuple[Domino, ...],
+        order: typing.Tuple[int, ...],
+        line: typing.Tuple[Domino, ...] = (),
+        picks: typing.Tuple[typing.Optional[int], ...] = (),
+        turn: int = 0,
+    ):
+        self.rules = rules
+        self.boards = boards
+        self.unseen = unseen
+        self.order = order
+        self.line = line
+        self.picks = picks
+        self.turn = turn
+
+    @classmethod
+    def start(
+        cls,
+        rules: Rule,
+        players: int,
+        dominoes: Dominoes,
+        rng: random.Random,
+    ) -> "Position":
+        """A new game before the first draw, in a random order."""
+        order = rng.sample(range(players), players) * rules.plays_per_turn()
+        return cls(
+            rules=rules,
+            boards=tuple(Board(rules=rules) for _ in range(players)),
+            unseen=tuple(dominoes),
+            order=tuple(order),
+        )
+
+    @classmethod
+    def from_game(
+        cls,
+        game: Game,
+        dominoes: Dominoes,
+        player: typing.Optional[Player] = None,
+        plans: typing.Dict[typing.Tuple[Player, int], typing.Optional[Play]] = None,
+    ) -> "Position":
+        """The position of a Game during selection, without peeking at
+        its Deck. Game.select pops each player from its order before asking
+        their agent, so pass that player to put them back in front.
+
+        Game places only once everybody has picked, but here picking is
+        placing, so dominoes already picked this turn are placed on copies
+        of their boards: where plans says, else at their best by
+        Board.preview, else discarded."""
+        if plans is None:
+            plans = {}
+        index = {other: i for i, other in enumerate(game.players)}
+        order = [index[other] for other in game.order]
+        if player is not None:
+            order.insert(0, index[player])
+        boards = {other: game.boards[other] for other in game.players}
+        line = getattr(game, "line", None)
+        entries = line.line if line is not None else []
+        seen = {domino for _, domino in entries}
+        for picker, domino in entries:
+            if picker is None:
+                continue
+            if boards[picker] is game.boards[picker]:
+                boards[picker] = boards[picker].copy()
+            board = boards[picker]
+            play = plans.get((picker, domino.number))
+            if play is None or not board.valid_play(play):
+                plays = ranked_plays(board, domino)
+                play = plays[0] if plays else None
+            if play is None:
+                board.discard(domino)
+            else:
+                board.play(play)
+        for board in boards.values():
+            seen.update(play.domino for play in board.played)
+            seen.update(board.discards)
+        return cls(
+            rules=game.rules,
+            boards=tuple(boards[other] for other in game.players),
+            unseen=tuple(domino for domino in dominoes if domino not in seen),
+            order=tuple(order),
+            line=tuple(domino for _, domino in entries),
+            picks=tuple(
+                None if picker is None else index[picker]
+                for picker, _ in entries
+            ),
+            turn=game.turn_num,
+        )
+
+    # STATE
+
+    def draw_num(self) -> int:
+        return DrawNum.THREE if Rule.THREE_PLAYERS in self.rules else DrawNum.FOUR
+
+    def to_move(self) -> typing.Optional[int]:
+        return self.order[0] if self.line and self.order else None
+
+    def terminal(self) -> bool:
+        return not self.line and (
+            self.turn >= self.rules.max_turns()
+            or len(self.unseen) < self.draw_num()
+        )
+
+    def chance(self) -> bool:
+        return not self.line and not self.terminal()
+
+    def key(self) -> tuple:
+        return (
+            tuple(board.key() for board in self.boards),
+            self.order,
+            tuple(domino.number for domino in self.line),
+            self.picks,
+            self.turn,
+        )
+
+    # MOVES
+
+    def moves(
+        self,
+        play_width: typing.Optional[int] = None,
+        ranked: Ranked = None,
+    ) -> typing.List[Move]:
+        """Every free slot with its valid plays, or only its play_width
+        best by Board.preview."""
+        if ranked is None:
+            ranked = ranked_plays
+        board = self.boards[self.order[0]]
+        moves = []
+        for slot, (domino, picker) in enumerate(zip(self.line, self.picks)):
+            if picker is not None:
+                continue
+            plays = ranked(board, domino)
+            if play_width is not None:
+                plays = plays[:play_width]
+            moves.extend(Move(slot, play) for play in plays or [None])
+        return moves
+
+    def apply(self, move: Move) -> "Position":
+        player = self.order[0]
+        board = self.boards[player].copy()
+        if move.play is None:
+            board.discard(self.line[move.slot])
+        else:
+            board.play(move.play)
+        boards = self.boards[:player] + (board,) + self.boards[player + 1:]
+        picks = self.picks[:move.slot] + (player,) + self.picks[move.slot + 1:]
+        order = self.order[1:]
+        if order:
+            return Position(self.rules, boards, self.unseen, order, self.line, picks, self.turn)
+        return Position(
+            self.rules,
+            boards,
+            self.unseen,
+            tuple(picker for picker in picks if picker is not None),
+            turn=self.turn,
+        )
+
+    def draws(
+        self,
+        samples: int,
+        rng: random.Random,
+    ) -> typing.List[typing.Tuple[Domino, ...]]:
+        """Every possible next line, or samples of them drawn uniformly,
+        as the deck is a uniform shuffle of the unseen dominoes."""
+        num = self.draw_num()
+        if math.comb(len(self.unseen), num) <= samples:
+            return list(it.combinations(self.unseen, num))
+        return [tuple(rng.sample(self.unseen, num)) for _ in range(samples)]
+
+    def after_draw(self, draw: typing.Sequence[Domino]) -> "Position":
+        line = tuple(sorted(draw))
+        return Position(
+            self.rules,
+            self.boards,
+            tuple(domino for domino in self.unseen if domino not in line),
+            self.order,
+            line,
+            (None,) * len(line),
+            self.turn + 1,
+        )
+
+
+class Result(typing.NamedTuple):
+    move: typing.Optional[Move]
+    value: float
+    nodes: int
+    seconds: float
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds else float("inf")
+
+
+class Expectimax:
+    """Expectiminimax for one player against the rest: it maximises, the
+    others minimise, and chance nodes average over the possible next lines.
+    Values are the player's evaluation minus the best other's.
+
+    Chance nodes enumerate the next lines when there are at most samples
+    of them and sample that many otherwise. Values are cached per position
+    and depth, and per drawn line, so repeated draws are searched once.
+
+    A move changes one board and shares the others, so ranked plays and
+    evaluations are memoised per Board object for the whole search."""
+
+    def __init__(
+        self,
+        depth: int = 2,
+        samples: int = 8,
+        play_width: typing.Optional[int] = 3,
+        evaluate: Evaluate = None,
+        seed: int = 0,
+    ):
+        self.depth = depth
+        self.samples = samples
+        self.play_width = play_width
+        if evaluate is None:
+            evaluate = Board.points
+        self.evaluate = evaluate
+        self.rng = random.Random(seed)
+        self.nodes = 0
+        self.cache: typing.Dict[tuple, float] = {}
+        # Keyed by id, holding on to the board so the id is not reused.
+        self.plays: typing.Dict[tuple, typing.Tuple[Board, typing.List[Play]]] = {}
+        self.values: typing.Dict[int, typing.Tuple[Board, float]] = {}
+
+    def ranked(self, board: Board, domino: Domino) -> typing.List[Play]:
+        key = (id(board), domino.number)
+        if key not in self.plays:
+            self.plays[key] = (board, ranked_plays(board, domino))
+        return self.plays[key][1]
+
+    def moves(self, position: Position) -> typing.List[Move]:
+        return position.moves(self.play_width, self.ranked)
+
+    def board_value(self, board: Board) -> float:
+        if id(board) not in self.values:
+            self.values[id(board)] = (board, self.evaluate(board))
+        return self.values[id(board)][1]
+
+    def margin(self, position: Position, player: int) -> float:
+        values = [self.board_value(board) for board in position.boards]
+        own = values.pop(player)
+        return own - max(values, default=0)
+
+    def search(self, position: Position, player: int) -> Result:
+        """Best move for player, who must be the one to move."""
+        self.nodes = 0
+        self.cache = {}
+        self.plays = {}
+        self.values = {}
+        start = time.perf_counter()
+        best: typing.Tuple[float, typing.Optional[Move]] = (-math.inf, None)
+        for move in self.moves(position):
+            value = self.root(position.apply(move), player, best[0])
+            if value > best[0]:
+                best = (value, move)
+        return Result(
+            move=best[1],
+            value=best[0],
+            nodes=self.nodes,
+            seconds=time.perf_counter() - start,
+        )
+
+    def root(self, child: Position, player: int, best: float) -> float:
+        """Value for player of a root move, given the best one so far."""
+        return self.value(child, player, self.depth - 1)
+
+    def value(self, position: Position, player: int, depth: int) -> float:
+        self.nodes += 1
+        if position.terminal() or depth <= 0:
+            return self.margin(position, player)
+
+        key = (position.key(), depth)
+        if key in self.cache:
+            return self.cache[key]
+
+        if position.chance():
+            values = []
+            for draw in position.draws(self.samples, self.rng):
+                draw_key = (key, tuple(sorted(domino.number for domino in draw)))
+                if draw_key not in self.cache:
+                    self.cache[draw_key] = self.value(
+                        position.after_draw(draw), player, depth
+                    )
+                values.append(self.cache[draw_key])
+            value = sum(values) / len(values)
+        else:
+            children = (
+                self.value(position.apply(move), player, depth - 1)
+                for move in self.moves(position)
+            )
+            value = max(children) if position.to_move() == player else min(children)
+
+        self.cache[key] = value
+        return value
+
+
+class Paranoid(Expectimax):
+    """Expectiminimax with alpha-beta: every other player is assumed to be
+    out to minimise player's margin, as one coalition.
+
+    Chance nodes are searched with a full window, so only their values,
+    which are exact, are cached."""
+
+    def root(self, child: Position, player: int, best: float) -> float:
+        return self.value(child, player, self.depth - 1, alpha=best)
+
+    def value(
+        self,
+        position: Position,
+        player: int,
+        depth: int,
+        alpha: float = -math.inf,
+        beta: float = math.inf,
+    ) -> float:
+        if position.chance() and depth > 0:
+            # Expectimax.value counts the node itself.
+            return super().value(position, player, depth)
+
+        self.nodes += 1
+        if position.terminal() or depth <= 0:
+            return self.margin(position, player)
+
+        maximise = position.to_move() == player
+        value = -math.inf if maximise else math.inf
+        for move in self.moves(position):
+            child = self.value(position.apply(move), player, depth - 1, alpha, beta)
+            if maximise:
+                value = max(value, child)
+                alpha = max(alpha, value)
+            else:
+                value = min(value, child)
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+        return value
+
+
+class MaxN(Expectimax):
+    """Max-n: every player maximises their own share of the total
+    evaluation, so coalitions and kingmaking play out as they would.
+    Evaluations are clipped at zero and normalised to shares summing to
+    one, which bounds them for shallow pruning: once the player to move
+    has a share of at least one minus what the previous player already
+    has elsewhere, that player will not come here. Values are shares."""
+
+    def shares(self, position: Position) -> typing.Tuple[float, ...]:
+        values = [max(0.0, self.board_value(board)) for board in position.boards]
+        total = sum(values)
+        if not total:
+            return (1 / len(values),) * len(values)
+        return tuple(value / total for value in values)
+
+    def root(self, child: Position, player: int, best: float) -> float:
+        return self.vector(child, self.depth - 1, player, best)[player]
+
+    def vector(
+        self,
+        position: Position,
+        depth: int,
+        parent: typing.Optional[int] = None,
+        bound: float = -math.inf,
+    ) -> typing.Tuple[float, ...]:
+        """Values for every player. parent moved into position and already
+        has a move worth bound to them."""
+        self.nodes += 1
+        if position.terminal() or depth <= 0:
+            return self.shares(position)
+
+        if position.chance():
+            key = (position.key(), depth)
+            if key not in self.cache:
+                vectors = []
+                for draw in position.draws(self.samples, self.rng):
+                    draw_key = (key, tuple(sorted(domino.number for domino in draw)))
+                    if draw_key not in self.cache:
+                        self.cache[draw_key] = self.vector(position.after_draw(draw), depth)
+                    vectors.append(self.cache[draw_key])
+                self.cache[key] = tuple(sum(values) / len(vectors) for values in zip(*vectors))
+            return self.cache[key]
+
+        mover = position.to_move()
+        best = None
+        for move in self.moves(position):
+            child = self.vector(
+                position.apply(move),
+                depth - 1,
+                mover,
+                -math.inf if best is None else best[mover],
+            )
+            if best is None or child[mover] > best[mover]:
+                best = child
+            # parent gets at most 1 - best[mover] here, no more than bound.
+            if parent is not None and parent != mover and best[mover] >= 1 - bound:
+                break
+        return best
+
+
+SEARCHES = {
+    "expectimax": Expectimax,
+    "paranoid": Paranoid,
+    "maxn": MaxN,
+}
+
+
+if __name__ == "__main__":
+
+    filename = "kingdomino.json"
+    dominoes = Dominoes.from_json(filename)
+
+    mode = sys.argv[1] if len(sys.argv) >= 2 else "expectimax"
+    players = int(sys.argv[2]) if len(sys.argv) >= 3 else 2
+    depth = int(sys.argv[3]) if len(sys.argv) >= 4 else 3
+    samples = int(sys.argv[4]) if len(sys.argv) == 5 else 4
+
+    rng = random.Random(0)
+    position = Position.start(Rule.default(players), players, dominoes, rng)
+
+    searcher = SEARCHES[mode](depth=depth, samples=samples)
+    nodes, seconds = 0, 0.0
+    while not position.terminal():
+        if position.chance():
+            position = position.after_draw(rng.sample(position.unseen, position.draw_num()))
+            continue
+        player = position.to_move()
+        result = searcher.search(position, player)
+        nodes += result.nodes
+        seconds += result.seconds
+        print(
+            f"turn {position.turn} player {player}: {result.move} "
+            f"value={result.value:.2f} nodes/s={result.nodes_per_second:.0f}"
+        )
+        position = position.apply(result.move)
+
+    print([board.points() for board in position.boards])
+    print(f"{mode}: {nodes} nodes, {nodes / seconds:.0f} nodes/s")
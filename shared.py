@@ -0,0 +1,276 @@
+import concurrent.futures
+import functools
+import numpy as np
+import random
+import sys
+import typing
+from multiprocessing import shared_memory
+from game import (
+    Board,
+    CATALOGUE,
+    Direction,
+    Domino,
+    Dominoes,
+    MaxTurns,
+    Play,
+    Point,
+    Rule,
+    Suit,
+    Tile,
+)
+
+
+DIRECTIONS = tuple(Direction)
+MAX_PLAYS = MaxTurns.MIGHTY_DUEL
+MAX_DECK = 48
+
+# A domino number is its row; suit 0 means no domino has that number.
+CATALOGUE_DTYPE = np.dtype([
+    ("left_suit", "<i1"),
+    ("left_crowns", "<i1"),
+    ("right_suit", "<i1"),
+    ("right_crowns", "<i1"),
+])
+BOARD_DTYPE = np.dtype([
+    ("rules", "<i4"),
+    ("played", "<i2"),
+    ("discarded", "<i2"),
+    ("plays", "<i2", (MAX_PLAYS, 4)),  # number, x, y, direction index
+    ("discards", "<i2", (MAX_PLAYS,)),
+])
+DECK_DTYPE = np.dtype([
+    ("size", "<i2"),
+    ("dominoes", "<i2", (MAX_DECK,)),
+])
+RESULT_DTYPE = np.dtype([
+    ("points", "<i4"),
+    ("crowns", "<i4"),
+    ("number", "<i2"),  # -1 when there was nothing to place
+    ("play", "<i2", (3,)),  # x, y, direction index; all -1 for a discard
+    ("score", "<f8"),
+])
+
+
+class Buffer(typing.NamedTuple):
+    memory: shared_memory.SharedMemory
+    array: np.ndarray
+
+    @classmethod
+    def create(cls, dtype: np.dtype, count: int) -> "Buffer":
+        memory = shared_memory.SharedMemory(create=True, size=max(1, dtype.itemsize * count))
+        array = np.ndarray((count,), dtype=dtype, buffer=memory.buf)
+        array[:] = np.zeros((), dtype=dtype)
+        return cls(memory, array)
+
+    @classmethod
+    def attach(cls, name: str, dtype: np.dtype, count: int) -> "Buffer":
+        memory = shared_memory.SharedMemory(name=name)
+        return cls(memory, np.ndarray((count,), dtype=dtype, buffer=memory.buf))
+
+
+class Handle(typing.NamedTuple):
+    """What a worker needs to attach to a SharedStore. Cheap to pickle."""
+    catalogue: typing.Tuple[str, int]
+    boards: typing.Tuple[str, int]
+    decks: typing.Tuple[str, int]
+    results: typing.Tuple[str, int]
+
+
+class SharedStore:
+    """Catalogue, boards, decks and results as fixed size records in shared
+    memory blocks, so pool workers read and write positions in place by
+    index instead of pickling Boards and Dominoes back and forth.
+
+    Boards are stored as their plays and discards and rebuilt by replaying
+    them, as the regions depend on how the dominoes were paired."""
+
+    def __init__(
+        self,
+        catalogue: Buffer,
+        boards: Buffer,
+        decks: Buffer,
+        results: Buffer,
+        owner: bool = False,
+    ):
+        self.catalogue = catalogue
+        self.boards = boards
+        self.decks = decks
+        self.results = results
+        self.owner = owner
+
+    @classmethod
+    def create(
+        cls,
+        dominoes: Dominoes,
+        boards: int,
+        decks: int = 0,
+    ) -> "SharedStore":
+        catalogue = Buffer.create(
+            CATALOGUE_DTYPE,
+            max(domino.number for domino in dominoes) + 1,
+        )
+        for domino in dominoes:
+            catalogue.array[domino.number] = (
+                domino.left.suit.value,
+                domino.left.crowns,
+                domino.right.suit.value,
+                domino.right.crowns,
+            )
+        return cls(
+            catalogue,
+            Buffer.create(BOARD_DTYPE, boards),
+            Buffer.create(DECK_DTYPE, decks),
+            Buffer.create(RESULT_DTYPE, boards),
+            owner=True,
+        )
+
+    def handle(self) -> Handle:
+        return Handle(*(
+            (buffer.memory.name, len(buffer.array))
+            for buffer in (self.catalogue, self.boards, self.decks, self.results)
+        ))
+
+    @classmethod
+    def attach(cls, handle: Handle) -> "SharedStore":
+        store = cls(*(
+            Buffer.attach(name, dtype, count)
+            for (name, count), dtype in zip(
+                handle,
+                (CATALOGUE_DTYPE, BOARD_DTYPE, DECK_DTYPE, RESULT_DTYPE),
+            )
+        ))
+        store.intern()
+        return store
+
+    def intern(self) -> None:
+        """Fills CATALOGUE from the shared catalogue, so a worker never has
+        to load the JSON."""
+        for number, (left_suit, left_crowns, right_suit, right_crowns) in enumerate(
+            self.catalogue.array.tolist()
+        ):
+            if left_suit:
+                CATALOGUE.intern(
+                    number,
+                    Tile(Suit(left_suit), left_crowns),
+                    Tile(Suit(right_suit), right_crowns),
+                )
+
+    # BOARDS
+
+    def write_board(self, index: int, board: Board) -> None:
+        record = self.boards.array[index]
+        record["rules"] = board.rules.value
+        record["played"] = len(board.played)
+        record["discarded"] = len(board.discards)
+        for i, play in enumerate(board.played):
+            record["plays"][i] = (
+                play.domino.number,
+                play.point.x,
+                play.point.y,
+                DIRECTIONS.index(play.direction),
+            )
+        for i, domino in enumerate(board.discards):
+            record["discards"][i] = domino.number
+
+    def read_board(self, index: int) -> Board:
+        record = self.boards.array[index]
+        board = Board(rules=Rule(int(record["rules"])))
+        for number, x, y, direction in record["plays"][:record["played"]].tolist():
+            board.play(Play(number, Point(x, y), DIRECTIONS[direction]))
+        for number in record["discards"][:record["discarded"]].tolist():
+            board.discard(CATALOGUE[number])
+        return board
+
+    # DECKS
+
+    def write_deck(self, index: int, dominoes: typing.Sequence[Domino]) -> None:
+        record = self.decks.array[index]
+        record["size"] = len(dominoes)
+        record["dominoes"][:len(dominoes)] = [domino.number for domino in dominoes]
+
+    def read_deck(self, index: int) -> typing.List[Domino]:
+        record = self.decks.array[index]
+        return [CATALOGUE[number] for number in record["dominoes"][:record["size"]].tolist()]
+
+    # RESULTS
+
+    def write_result(
+        self,
+        index: int,
+        board: Board,
+        domino: typing.Optional[Domino] = None,
+        play: typing.Optional[Play] = None,
+        score: float = 0.0,
+    ) -> None:
+        self.results.array[index] = (
+            board.points(),
+            board.crowns(),
+            -1 if domino is None else domino.number,
+            (-1, -1, -1) if play is None else (
+                play.point.x, play.point.y, DIRECTIONS.index(play.direction)
+            ),
+            score,
+        )
+
+    def close(self) -> None:
+        for buffer in (self.catalogue, self.boards, self.decks, self.results):
+            buffer.memory.close()
+            if self.owner:
+                buffer.memory.unlink()
+
+    def __enter__(self) -> "SharedStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+@functools.lru_cache(maxsize=None)
+def _attached(handle: Handle) -> SharedStore:
+    """One attachment per worker process and store."""
+    return SharedStore.attach(handle)
+
+
+def greedy_step(handle: Handle, index: int) -> int:
+    """Plays the first domino of deck index greedily onto board index, in
+    place, and records the outcome."""
+    store = _attached(handle)
+    board = store.read_board(index)
+    deck = store.read_deck(index)
+    if not deck:
+        store.write_result(index, board)
+        return index
+    domino = deck[0]
+    ranked = board.ranked_plays(domino)
+    if ranked:
+        delta, play = ranked[0]
+        board.play(play)
+    else:
+        play = None
+        board.discard(domino)
+    store.write_board(index, board)
+    store.write_deck(index, deck[1:])
+    store.write_result(index, board, domino, play, board.points())
+    return index
+
+
+if __name__ == "__main__":
+
+    filename = "kingdomino.json"
+    dominoes = Dominoes.from_json(filename)
+
+    random.seed(0)
+    boards = int(sys.argv[1]) if len(sys.argv) == 2 else 8
+    rules = Rule.TWO_PLAYERS
+
+    with SharedStore.create(dominoes, boards, boards) as store:
+        for i in range(boards):
+            store.write_board(i, Board(rules=rules))
+            store.write_deck(i, random.sample(dominoes, rules.max_turns() * rules.plays_per_turn()))
+
+        handle = store.handle()
+        with concurrent.futures.ProcessPoolExecutor() as executor:
+            for turn in range(rules.max_turns() * rules.plays_per_turn()):
+                list(executor.map(greedy_step, [handle] * boards, range(boards)))
+
+        print(store.results.array[["points", "crowns"]])
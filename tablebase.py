@@ -0,0 +1,164 @@
+import hashlib
+import itertools as it
+import mmap
+import random
+import struct
+import sys
+import typing
+from game import Board, Domino, Dominoes, Rule
+from planner import Planner
+
+
+MAGIC = b"KDTB"
+HEADER = struct.Struct("<4sIII")  # magic, rules, plies, count
+RECORD = struct.Struct("<Qh")  # position key, best final points
+
+
+def position_key(board: Board, dominoes: typing.Sequence[Domino]) -> int:
+    """Stable 64 bit key for a board and the dominoes it still has to place."""
+    digest = hashlib.blake2b(
+        repr((board.key(), tuple(domino.number for domino in dominoes))).encode(),
+        digest_size=8,
+    ).digest()
+    return int.from_bytes(digest, "little")
+
+
+def random_board(
+    rules: Rule,
+    dominoes: typing.Sequence[Domino],
+    rng: random.Random,
+) -> Board:
+    """Plays the given dominoes in order onto a new board at random."""
+    board = Board(rules=rules)
+    for domino in dominoes:
+        plays = list(board.valid_plays(domino))
+        if plays:
+            board.play(rng.choice(plays))
+        else:
+            board.discard(domino)
+    return board
+
+
+def final_turn_positions(
+    rules: Rule,
+    dominoes: Dominoes,
+    boards: int,
+    plies: int = None,
+    remaining_per_board: typing.Optional[int] = None,
+    seed: int = 0,
+) -> typing.Iterator[typing.Tuple[Board, typing.Tuple[Domino, ...]]]:
+    """Yields random boards one turn from the end of the game, each with
+    every ordering of the unseen dominoes it could still be dealt, or a
+    random sample of remaining_per_board of them."""
+    if plies is None:
+        plies = rules.plays_per_turn()
+    rng = random.Random(seed)
+    placed = rules.max_turns() * rules.plays_per_turn() - plies
+    for _ in range(boards):
+        drawn = rng.sample(dominoes, placed)
+        board = random_board(rules, drawn, rng)
+        unseen = [domino for domino in dominoes if domino not in drawn]
+        remaining = list(it.permutations(unseen, plies))
+        if remaining_per_board is not None:
+            remaining = rng.sample(remaining, min(remaining_per_board, len(remaining)))
+        for sequence in remaining:
+            yield board, sequence
+
+
+def build(
+    filename: str,
+    rules: Rule,
+    positions: typing.Iterable[typing.Tuple[Board, typing.Sequence[Domino]]],
+) -> int:
+    """Solves every position exactly and writes the sorted table."""
+    planner = Planner(rules)
+    table: typing.Dict[int, int] = {}
+    plies = None
+    for board, sequence in positions:
+        if plies is None:
+            plies = len(sequence)
+        elif plies != len(sequence):
+            raise ValueError("All positions must have the same number of plies")
+        key = position_key(board, sequence)
+        if key not in table:
+            table[key] = planner.solve(sequence, board.copy()).score
+
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, rules.value, plies or 0, len(table)))
+        for key in sorted(table):
+            f.write(RECORD.pack(key, table[key]))
+    return len(table)
+
+
+class Tablebase:
+    """Read only, memory mapped table of exact scores for endgame positions."""
+
+    def __init__(self, filename: str):
+        self.file = open(filename, "rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, rules, self.plies, self.count = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a tablebase")
+        self.rules = Rule(rules)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _key(self, i: int) -> int:
+        return RECORD.unpack_from(self.mmap, HEADER.size + i * RECORD.size)[0]
+
+    def get(self, key: int) -> typing.Optional[int]:
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self._key(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.count:
+            found, score = RECORD.unpack_from(self.mmap, HEADER.size + low * RECORD.size)
+            if found == key:
+                return score
+        return None
+
+    def lookup(
+        self,
+        board: Board,
+        dominoes: typing.Sequence[Domino],
+    ) -> typing.Optional[int]:
+        """Returns the best final points for the position, if it is stored."""
+        if len(dominoes) != self.plies or board.rules != self.rules:
+            return None
+        return self.get(position_key(board, dominoes))
+
+    def close(self) -> None:
+        self.mmap.close()
+        self.file.close()
+
+    def __enter__(self) -> "Tablebase":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+
+    filename = "kingdomino.json"
+    dominoes = Dominoes.from_json(filename)
+
+    boards = int(sys.argv[1]) if len(sys.argv) == 2 else 2
+
+    for rules in (Rule.MIGHTY_DUEL, Rule.FOUR_PLAYERS):
+        output = f"tablebase_{rules.name.lower()}.kdtb"
+        count = build(
+            output,
+            rules,
+            final_turn_positions(rules, dominoes, boards, remaining_per_board=20),
+        )
+        print(f"{output}: {count} positions")
+        with Tablebase(output) as tablebase:
+            for board, sequence in final_turn_positions(
+                rules, dominoes, 1, remaining_per_board=3
+            ):
+                print(sequence, tablebase.lookup(board, sequence))
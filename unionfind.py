@@ -8,11 +8,13 @@ class Node:
         self,
         item: T,
         parent: "Node"=None,
-        size: int=1
+        size: int=1,
+        weight: int=0,
     ):
         self.item = item
         self.parent = self
         self.size = size
+        self.weight = weight
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, Node):
@@ -47,9 +49,25 @@ class UnionFind:
             self._nodes[item] = Node(item)
         return self._nodes[item]
 
+    def __contains__(self, item: T) -> bool:
+        return item in self._nodes
+
+    def add(self, item: T, weight: int=0) -> None:
+        """Adds item as its own group, if it is new, carrying weight."""
+        if item not in self._nodes:
+            self._nodes[item] = Node(item, weight=weight)
+
     def find(self, item: T) -> T:
         return self._find(self._to_node(item)).item
 
+    def size(self, item: T) -> int:
+        """Returns the number of items in the group of item."""
+        return self._find(self._to_node(item)).size
+
+    def weight(self, item: T) -> int:
+        """Returns the total weight of the group of item."""
+        return self._find(self._to_node(item)).weight
+
     def _find(self, node: Node) -> Node:
         if node.parent == node:
             return node
@@ -73,6 +91,7 @@ class UnionFind:
 
         root_y.parent = root_x
         root_x.size += root_y.size
+        root_x.weight += root_y.weight
 
     def groups(self) -> typing.FrozenSet[typing.FrozenSet[T]]:
 
@@ -87,6 +106,16 @@ class UnionFind:
             frozenset(node.item for node in nodes)
             for nodes in d.values()
         )
+
+    def copy(self) -> "UnionFind":
+        nodes = {
+            item: Node(item, size=node.size, weight=node.weight)
+            for item, node in self._nodes.items()
+        }
+        for item, node in self._nodes.items():
+            nodes[item].parent = nodes[node.parent.item]
+        return self.__class__(nodes)
+
     def __str__(self) -> str:
         return str(self.groups())
 